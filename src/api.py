@@ -1,25 +1,146 @@
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+from contextlib import asynccontextmanager
+from collections import Counter
+import asyncio
+import json
+import logging
+import numpy as np
 import os
 import sys
+import time
 
 # Add src to path if needed (though typically this runs from root)
 sys.path.append(os.path.dirname(__file__))
 
-from inference import SepsisPredictor
-from clinical_rules import apply_clinical_rules
+from clinical_rules import apply_clinical_rules, apply_clinical_rules_batch, apply_clinical_rules_columns
+from patient_store import PatientHistoryStore
+from event_log import EventLog
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry
+from thresholds import THRESHOLDS, risk_label, risk_labels
+from inference import ColumnBatch, ExplanationUnavailable
+import columnar
+from metrics import REGISTRY, ERRORS, OVERRIDES, STAGE_SECONDS, RequestTimer
 
-app = FastAPI(title="Clinivora Sepsis API", version="1.0")
+# key=value log lines; SEPSIS_LOG_LEVEL=DEBUG logs every payload
+logging.basicConfig(
+    level=os.environ.get("SEPSIS_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"
+)
+logger = logging.getLogger(__name__)
 
-# Initialize Predictor
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'sepsis_xgboost.pkl')
-try:
-    predictor = SepsisPredictor(MODEL_PATH)
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to load model: {e}")
-    predictor = None
+# SEPSIS_MODEL_PATH may point to the exported sepsis_xgboost.npz (NumPy-only runtime)
+MODEL_PATH = os.environ.get(
+    "SEPSIS_MODEL_PATH", os.path.join(os.path.dirname(__file__), 'sepsis_xgboost.pkl')
+)
+
+# Versioned model files (<name>.pkl + <name>.pkl.features, or <name>.npz) that
+# POST /models may load; the file name without extension is the default version
+MODEL_DIR = os.path.abspath(os.environ.get("SEPSIS_MODEL_DIR", os.path.dirname(MODEL_PATH)))
+
+# SEPSIS_WORKERS > 0: score in that many forked processes sharing the loaded model
+# (one core each, one pool per loaded model version). 0 (default): score in this process.
+N_WORKERS = int(os.environ.get("SEPSIS_WORKERS", 0))
+
+def new_cache():
+    # Cache of model outputs for repeated identical feature vectors (SEPSIS_CACHE=0 turns it off)
+    if os.environ.get("SEPSIS_CACHE", "1") == "0":
+        return None
+    return PredictionCache(
+        max_size=int(os.environ.get("SEPSIS_CACHE_SIZE", 10_000)),
+        ttl_seconds=float(os.environ.get("SEPSIS_CACHE_TTL", 300))
+    )
+
+# Active model (+ optional canary/shadow candidate); empty until load_model() is done
+registry = ModelRegistry(cache_factory=new_cache, n_workers=N_WORKERS)
+model_state = {"status": "loading", "error": None, "load_seconds": None}
+
+# Per-patient trajectories for Lag1/Delta/RollMean6h (requests with a patient_id)
+history_store = PatientHistoryStore()
+
+# Durable log of the patient vitals events, replayed into history_store on startup so
+# the temporal features survive a restart (SEPSIS_EVENT_LOG="" turns it off).
+# Events are written every SEPSIS_EVENT_LOG_FLUSH_MS (one fsync per batch).
+EVENT_LOG_PATH = os.environ.get(
+    "SEPSIS_EVENT_LOG", os.path.join(os.path.dirname(__file__), '.event_log', 'events.sqlite3')
+)
+event_log = None
+replay_state = {"patients": None, "seconds": None}
+
+def open_event_log():
+    global event_log
+    if not EVENT_LOG_PATH:
+        return
+    event_log = EventLog(
+        EVENT_LOG_PATH,
+        ttl_seconds=history_store.ttl_seconds,
+        flush_interval_ms=float(os.environ.get("SEPSIS_EVENT_LOG_FLUSH_MS", 50))
+    )
+    start = time.perf_counter()
+    event_log.compact()
+    replay_state["patients"] = event_log.replay(history_store)
+    replay_state["seconds"] = time.perf_counter() - start
+    logger.info("Event log replayed: path=%s patients=%d seconds=%.2f",
+                EVENT_LOG_PATH, replay_state["patients"], replay_state["seconds"])
+
+def model_version(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+async def load_model():
+    """
+    Loads the startup model off the event loop (unpickling pulls in xgboost/sklearn)
+    and activates it once warmed up, which flips readiness.
+    """
+    start = time.perf_counter()
+    loading = asyncio.to_thread(registry.load, MODEL_PATH, model_version(MODEL_PATH))
+    # Histories are rebuilt meanwhile; scoring (which updates them) waits for both
+    loaded, replayed = await asyncio.gather(
+        loading, asyncio.to_thread(open_event_log), return_exceptions=True
+    )
+    if isinstance(replayed, Exception):
+        ERRORS.inc('event_log')
+        logger.error("Event log replay failed, starting cold: path=%s error=%s", EVENT_LOG_PATH, replayed)
+    if isinstance(loaded, Exception):
+        logger.critical("Failed to load model: path=%s error=%s", MODEL_PATH, loaded)
+        model_state.update(status="failed", error=str(loaded))
+        return
+    registry.activate(loaded)
+    model_state.update(status="ready", load_seconds=time.perf_counter() - start)
+    logger.info("Model ready: path=%s load_seconds=%.2f", MODEL_PATH, model_state["load_seconds"])
+
+@asynccontextmanager
+async def lifespan(app):
+    # The model loads in the background: / (liveness) answers at once,
+    # /ready and the scoring endpoints once the model is in
+    loading = asyncio.create_task(load_model())
+    yield
+    loading.cancel()
+    registry.close()
+    if event_log is not None:
+        event_log.close()
+
+app = FastAPI(title="Clinivora Sepsis API", version="1.0", lifespan=lifespan)
+app.add_middleware(RequestTimer)
+
+def score_payloads(payloads):
+    """Model call for a list of (current_data, temporal) pairs -> (probability, version) pairs."""
+    return registry.score(payloads)
+
+# Concurrent /predict requests are scored together: up to SEPSIS_BATCH_MAX requests
+# or SEPSIS_BATCH_WAIT_MS milliseconds after the first one, whichever comes first
+# (one batch in flight per worker)
+batcher = MicroBatcher(
+    score_payloads,
+    max_batch=int(os.environ.get("SEPSIS_BATCH_MAX", 64)),
+    max_wait_ms=float(os.environ.get("SEPSIS_BATCH_WAIT_MS", 2.0)),
+    max_concurrency=max(1, N_WORKERS)
+)
 
 class VitalsInput(BaseModel):
     HR: Optional[float] = None
@@ -33,50 +154,476 @@ class VitalsInput(BaseModel):
     GCS: Optional[float] = None
     Age: Optional[float] = None
     ICULOS: Optional[float] = None
+    # Optional: track the patient server-side for real temporal features
+    patient_id: Optional[str] = None
+    timestamp: Optional[float] = None # epoch seconds, defaults to now
     # Flexible dict to catch any other optional features
     class Config:
         extra = "allow"
 
-@app.get("/")
-def health_check():
-    return {"status": "online", "model_loaded": predictor is not None}
+class BatchVitalsInput(BaseModel):
+    patients: List[VitalsInput]
 
-@app.post("/predict")
-def predict_sepsis(data: VitalsInput):
-    if predictor is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+ACTIONS = {
+    "CRITICAL": "Immediate ICU Consult + Lactate Test",
+    "WARNING": "Increase Monitoring Frequency",
+    "STABLE": "Continue Routine Care"
+}
+
+def risk_level(final_prob):
+    """Calibrated risk levels (thresholds.py / tuning artifact). Returns (label, action)."""
+    label = risk_label(final_prob)
+    return label, ACTIONS[label]
+
+def format_result(final_prob, status_source, rule_reason, version=None):
+    """Formatting for UI"""
+    risk_label, action = risk_level(final_prob)
+    return {
+        "diagnosis": risk_label,
+        "risk_score": f"{final_prob * 100:.1f}%",
+        "raw_probability": final_prob,
+        "action": action,
+        "alert": rule_reason if status_source == "OVERRIDE" else None,
+        "source": status_source,
+        "model_version": version
+    }
 
+def split_payload(data):
+    """Returns (current_data, temporal) for one VitalsInput."""
     # Filter out None values so they don't overwrite actual data in Smart Mapping
     current_data = {k: v for k, v in data.dict().items() if v is not None}
-    print(f"DEBUG: API received payload: {current_data}")
+    patient_id = current_data.pop("patient_id", None)
+    timestamp = current_data.pop("timestamp", None)
+
+    temporal = None
+    if patient_id is not None:
+        if timestamp is None:
+            timestamp = time.time()
+        temporal = history_store.update(patient_id, current_data, timestamp)
+        # A late reading (not recorded) is scored on its own, as a cold start
+        if temporal is not None and event_log is not None:
+            event_log.append(patient_id, current_data, timestamp)
+    return current_data, temporal
+
+@app.get("/")
+def health_check():
+    """Liveness: the process is up (the model may still be loading, see /ready)."""
+    return {
+        "status": "online",
+        "model_loaded": registry.active is not None,
+        "model": model_state,
+        "patients_tracked": len(history_store),
+        "event_log": event_log.stats() if event_log is not None else None,
+        "replay": replay_state,
+        "batching": batcher.stats(),
+        "thresholds": THRESHOLDS,
+        "models": registry.status()
+    }
+
+async def evaluate(current_data, temporal):
+    """Model (micro-batched) + clinical rules + risk level for one split payload."""
+    t1 = time.perf_counter()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received payload: %s", current_data)
     
-    # 1. Run Inference
-    # Note: connect history/baseline if API evolves, for now stateless
-    raw_prob = predictor.predict(current_data)
+    # 1. Run Inference (micro-batched with concurrent requests)
+    # Stateless (cold start) unless a patient_id lets us use the stored trajectory
+    try:
+        raw_prob, version = await batcher.submit((current_data, temporal))
+    except Exception as e:
+        ERRORS.inc('inference')
+        logger.error("Prediction error: %s", e)
+        raw_prob, version = 0.0, None
+    t2 = time.perf_counter()
+    STAGE_SECONDS.observe('inference', t2 - t1)
     
     # 2. Apply Clinical Rules (Hybrid Layer)
     final_prob, status_source, rule_reason = apply_clinical_rules(raw_prob, current_data)
+    STAGE_SECONDS.observe('rules', time.perf_counter() - t2)
+    if status_source == "OVERRIDE":
+        OVERRIDES.inc(rule_reason)
     
-    # 3. Calibrate Risk Levels (The "Whisper" Fix)
-    if final_prob >= 0.22:
-        risk_label = "CRITICAL"
-        action = "Immediate ICU Consult + Lactate Test"
-    elif final_prob >= 0.08:
-        risk_label = "WARNING"
-        action = "Increase Monitoring Frequency"
+    # 3. Calibrate Risk Levels
+    return format_result(final_prob, status_source, rule_reason, version)
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 once the model can score, 503 while loading or after a failed load."""
+    if registry.active is None:
+        raise HTTPException(status_code=503, detail=f"Model {model_state['status']}")
+    return {"ready": True, "load_seconds": model_state["load_seconds"], "version": registry.active.version}
+
+@app.post("/predict")
+async def predict_sepsis(data: VitalsInput, request: Request):
+    # Body parsing + Pydantic validation: from arrival (RequestTimer) to here
+    t0 = time.perf_counter()
+    received_at = request.scope.get("state", {}).get("received_at")
+    if received_at is not None:
+        STAGE_SECONDS.observe('validation', t0 - received_at)
+
+    if registry.active is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    current_data, temporal = split_payload(data)
+    STAGE_SECONDS.observe('history', time.perf_counter() - t0)
+    return await evaluate(current_data, temporal)
+
+# Exact (TreeSHAP) explanations cost ~1 ms per row on one core: cap the rows per request
+EXPLAIN_EXACT_MAX_ROWS = int(os.environ.get("SEPSIS_EXPLAIN_EXACT_MAX_ROWS", 64))
+
+@app.post("/predict/batch")
+def predict_sepsis_batch(data: BatchVitalsInput, explain: bool = False, top_k: int = 3, exact: bool = False):
+    """
+    explain=true adds the top_k drivers (clinical inputs by contribution to the
+    model score) to every result the model decides (no rule override).
+    exact=true uses TreeSHAP values (slower, at most SEPSIS_EXPLAIN_EXACT_MAX_ROWS rows).
+    """
+    if registry.active is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if explain and not 1 <= top_k <= 20:
+        raise HTTPException(status_code=422, detail="top_k must be within [1, 20]")
+    if explain and exact and len(data.patients) > EXPLAIN_EXACT_MAX_ROWS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"exact explanations are limited to {EXPLAIN_EXACT_MAX_ROWS} patients per request"
+        )
+
+    t0 = time.perf_counter()
+    payloads = [split_payload(p) for p in data.patients]
+    batch = [current_data for current_data, _ in payloads]
+    t1 = time.perf_counter()
+    STAGE_SECONDS.observe('history', t1 - t0)
+
+    # 1. Run Inference (one model call for the whole ward)
+    try:
+        scored = score_payloads(payloads)
+    except Exception as e:
+        ERRORS.inc('batch_inference')
+        logger.error("Batch prediction error: %s", e)
+        raise HTTPException(status_code=500, detail="Batch prediction failed")
+    t2 = time.perf_counter()
+    STAGE_SECONDS.observe('inference', t2 - t1)
+
+    # 2. Clinical Rules (all patients at once) + 3. Risk Levels per patient
+    ruled = apply_clinical_rules_batch([p for p, _ in scored], batch)
+    t3 = time.perf_counter()
+    STAGE_SECONDS.observe('rules', t3 - t2)
+    results = []
+    for (final_prob, status_source, rule_reason), (_, version) in zip(ruled, scored):
+        if status_source == "OVERRIDE":
+            OVERRIDES.inc(rule_reason)
+        results.append(format_result(final_prob, status_source, rule_reason, version))
+    if not explain:
+        return {"count": len(results), "results": results}
+
+    # 4. Explanations for the model-decided rows (overrides already carry their reason)
+    rows = [i for i, r in enumerate(results) if r["source"] == "AI_DERIVED"]
+    try:
+        explanations = registry.explain(
+            [payloads[i] for i in rows], [scored[i][1] for i in rows], top_k, exact
+        )
+    except ExplanationUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    for r in results:
+        r["explanation"] = None
+    for i, explanation in zip(rows, explanations):
+        results[i]["explanation"] = explanation
+    explain_ms = (time.perf_counter() - t3) * 1000.0
+    return {"count": len(results), "results": results, "explain_ms": explain_ms}
+
+# --- Columnar batches ---
+# High-volume callers (integration engines) post one column per input instead of
+# one JSON object per patient: the columns go straight into the model matrix.
+# Content-Type: Arrow IPC stream, MessagePack or JSON (see columnar.py);
+# the scores come back as columns in the Accept format (default: the request's).
+
+def split_columns(columns, n):
+    """ColumnBatch of decoded columns; rows with a patient_id use (and update) its history."""
+    patient_ids = columns.pop("patient_id", None)
+    timestamps = columns.pop("timestamp", None)
+    batch = ColumnBatch.from_columns(columns, n)
+    if patient_ids is not None:
+        now = time.time()
+        for row, patient_id in enumerate(patient_ids):
+            if patient_id is None:
+                continue
+            timestamp = now
+            if timestamps is not None and timestamps[row] == timestamps[row]:
+                timestamp = float(timestamps[row])
+            current = batch.values[row].tolist()
+            temporal = history_store.update_vitals(patient_id, current, timestamp)
+            if temporal is None:
+                continue  # late reading: keeps its cold-start features
+            batch.values[row], batch.lag1[row], batch.delta[row], batch.roll_mean[row] = temporal
+            if event_log is not None:
+                event_log.append_vitals(patient_id, current, timestamp)
+    return batch, patient_ids
+
+def score_columns(columns, n):
+    """Columnar /predict/batch: history, model, clinical rules and risk levels as arrays."""
+    t0 = time.perf_counter()
+    batch, patient_ids = split_columns(columns, n)
+    t1 = time.perf_counter()
+    STAGE_SECONDS.observe('history', t1 - t0)
+
+    # 1. Run Inference (one model call per routed model version)
+    scored = score_payloads(batch)
+    t2 = time.perf_counter()
+    STAGE_SECONDS.observe('inference', t2 - t1)
+
+    # 2. Clinical Rules + 3. Risk Levels, vectorized
+    final, reasons = apply_clinical_rules_columns(np.array([p for p, _ in scored]), columns)
+    for reason, count in Counter(r for r in reasons if r is not None).items():
+        OVERRIDES.inc(reason, count)
+    labels = risk_labels(final)
+    STAGE_SECONDS.observe('rules', time.perf_counter() - t2)
+
+    results = {} if patient_ids is None else {"patient_id": patient_ids}
+    results.update(
+        diagnosis=labels,
+        raw_probability=final,
+        action=[ACTIONS[label] for label in labels],
+        alert=reasons,
+        source=np.where(np.equal(reasons, None), "AI_DERIVED", "OVERRIDE").astype(object),
+        model_version=[version for _, version in scored]
+    )
+    return results
+
+@app.post("/predict/columns")
+async def predict_sepsis_columns(request: Request):
+    """
+    Scores a columnar batch: one column per input (HR, SBP, ..., plus optional
+    patient_id and timestamp). Returns columns patient_id (if sent), diagnosis,
+    raw_probability, action, alert, source and model_version.
+    """
+    if registry.active is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    fmt = columnar.media_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415, detail=f"Content-Type must be one of {sorted(columnar.MEDIA_TYPES)}"
+        )
+    if not columnar.available(fmt):
+        raise HTTPException(status_code=415, detail=f"{columnar.CONTENT_TYPES[fmt]} is not supported by this server")
+    out_fmt = columnar.accepted_format(request.headers.get("accept"), fmt)
+    if out_fmt is None:
+        formats = [media for f, media in columnar.CONTENT_TYPES.items() if columnar.available(f)]
+        raise HTTPException(status_code=406, detail=f"Acceptable formats: {formats}")
+
+    body = await request.body()
+    try:
+        columns, n = columnar.decode(body, fmt)
+    except columnar.ColumnarError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        results = await asyncio.to_thread(score_columns, columns, n)
+    except Exception as e:
+        ERRORS.inc('batch_inference')
+        logger.error("Columnar prediction error: %s", e)
+        raise HTTPException(status_code=500, detail="Batch prediction failed")
+    return Response(columnar.encode(results, out_fmt), media_type=columnar.CONTENT_TYPES[out_fmt])
+
+# --- Streaming ingestion ---
+# One long-lived connection carries timestamped events for many patients, one JSON
+# object per line (NDJSON). Each event is a VitalsInput (normally with patient_id and
+# timestamp). Results come back in event order, one JSON line per event, with
+# "seq" (0-based event number on the connection), patient_id and timestamp added.
+
+# Events accepted but not yet answered, per connection (backpressure on the reader)
+STREAM_MAX_IN_FLIGHT = int(os.environ.get("SEPSIS_STREAM_MAX_IN_FLIGHT", 1024))
+
+async def _finish_event(seq, data, current_data, temporal):
+    result = await evaluate(current_data, temporal)
+    result.update(seq=seq, patient_id=data.patient_id, timestamp=data.timestamp)
+    return result
+
+def start_event(seq, line):
+    """
+    Parses one event and updates its patient's history right away (in arrival
+    order); scoring runs in the background. Returns an awaitable of the result.
+    """
+    try:
+        data = VitalsInput(**json.loads(line))
+    except (ValueError, TypeError) as e:
+        # Bad JSON, a ValidationError (a ValueError) or JSON that is not an object
+        ERRORS.inc('stream_event')
+        future = asyncio.get_running_loop().create_future()
+        future.set_result({"seq": seq, "error": f"Invalid event: {e}"})
+        return future
+
+    t0 = time.perf_counter()
+    current_data, temporal = split_payload(data)
+    STAGE_SECONDS.observe('history', time.perf_counter() - t0)
+    return asyncio.ensure_future(_finish_event(seq, data, current_data, temporal))
+
+async def pump_events(lines, send):
+    """
+    Feeds events from the async iterator `lines` through the scoring path and
+    awaits send(result) for each, in order, while later events are still arriving.
+    """
+    pending = asyncio.Queue(maxsize=STREAM_MAX_IN_FLIGHT)
+
+    async def reader():
+        seq = 0
+        try:
+            async for line in lines:
+                if line.strip():
+                    await pending.put(start_event(seq, line))
+                    seq += 1
+        finally:
+            await pending.put(None)
+
+    read_task = asyncio.create_task(reader())
+    try:
+        while (future := await pending.get()) is not None:
+            await send(await future)
+        await read_task  # re-raises a failed read
+    finally:
+        read_task.cancel()
+
+async def ndjson_lines(chunks):
+    """Splits a byte-chunk stream into lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to the endpoint, which keeps reading
+    the request body while results stream out (Starlette's disconnect listener
+    would otherwise consume the body chunks). A disconnect surfaces as
+    ClientDisconnect in the body reader instead.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+@app.post("/stream")
+async def stream_predictions(request: Request):
+    """Chunked NDJSON upload in, NDJSON results out (streamed as events are scored)."""
+    if registry.active is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    results = asyncio.Queue()
+
+    async def run():
+        try:
+            await pump_events(ndjson_lines(request.stream()), results.put)
+        except ClientDisconnect:
+            pass
+        finally:
+            await results.put(None)
+
+    async def body():
+        task = asyncio.create_task(run())
+        try:
+            while (result := await results.get()) is not None:
+                yield json.dumps(result) + "\n"
+            await task
+        finally:
+            task.cancel()
+
+    return DuplexStreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.websocket("/ws")
+async def stream_websocket(websocket: WebSocket):
+    """WebSocket feed: text frames of one or more NDJSON events, one JSON frame back per event."""
+    await websocket.accept()
+    if registry.active is None:
+        await websocket.close(code=1011, reason="Model not loaded")
+        return
+
+    async def frames():
+        while True:
+            for line in (await websocket.receive_text()).split("\n"):
+                yield line
+
+    try:
+        await pump_events(frames(), websocket.send_json)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus exposition: stage/request latency histograms and counters (workers included)."""
+    extra = registry.metrics_snapshots()
+    return PlainTextResponse(REGISTRY.render(extra), media_type="text/plain; version=0.0.4")
+
+# --- Model registry ---
+# Roll out a retrained model without a restart: POST /models loads and warms it up
+# in the background while the current model keeps serving, then either swaps it in
+# (role "active") or sends it `percent` % of the rows as a canary (answers them) or
+# shadow (scored alongside, compared in /models and sepsis_shadow_abs_diff).
+
+class ModelLoadInput(BaseModel):
+    path: str                      # file in SEPSIS_MODEL_DIR, e.g. "sepsis_xgboost-v2.pkl"
+    version: Optional[str] = None  # defaults to the file name without extension
+    role: str = "active"           # active | canary | shadow
+    percent: float = 10.0          # share of rows for a canary/shadow candidate
+
+def resolve_model_path(path):
+    """Absolute path of a model file inside MODEL_DIR (no escaping it)."""
+    full = os.path.abspath(os.path.join(MODEL_DIR, path))
+    if not full.startswith(MODEL_DIR + os.sep):
+        raise HTTPException(status_code=400, detail="Model path must be inside SEPSIS_MODEL_DIR")
+    if not os.path.isfile(full):
+        raise HTTPException(status_code=404, detail=f"No model file {path}")
+    return full
+
+@app.get("/models")
+def list_models():
+    return registry.status()
+
+@app.post("/models")
+async def load_model_version(data: ModelLoadInput):
+    if data.role not in ("active", "canary", "shadow"):
+        raise HTTPException(status_code=422, detail="role must be active, canary or shadow")
+    if not 0.0 <= data.percent <= 100.0:
+        raise HTTPException(status_code=422, detail="percent must be within [0, 100]")
+    path = resolve_model_path(data.path)
+    version = data.version or model_version(path)
+    if any(v.version == version for v in registry.versions()):
+        raise HTTPException(status_code=409, detail=f"Version {version} is already loaded")
+
+    try:
+        loaded = await asyncio.to_thread(registry.load, path, version)
+    except Exception as e:
+        # The current model keeps serving
+        ERRORS.inc('model_load')
+        logger.error("Model load failed: path=%s error=%s", path, e)
+        raise HTTPException(status_code=422, detail=f"Model load failed: {e}")
+
+    if data.role == "active":
+        registry.activate(loaded)
     else:
-        risk_label = "STABLE"
-        action = "Continue Routine Care"
+        registry.set_candidate(loaded, data.role, data.percent)
+    return registry.status()
 
-    # Formatting for UI
-    return {
-        "diagnosis": risk_label,
-        "risk_score": f"{final_prob * 100:.1f}%",
-        "raw_probability": final_prob,
-        "action": action,
-        "alert": rule_reason if status_source == "OVERRIDE" else None,
-        "source": status_source
-    }
+@app.post("/models/{version}/promote")
+def promote_model(version: str):
+    try:
+        registry.promote(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No candidate version {version}")
+    return registry.status()
+
+@app.delete("/models/candidate")
+def remove_candidate():
+    if registry.clear_candidate() is None:
+        raise HTTPException(status_code=404, detail="No candidate model")
+    return registry.status()
+
+@app.delete("/patients/{patient_id}")
+def discharge_patient(patient_id: str):
+    if not history_store.discharge(patient_id):
+        raise HTTPException(status_code=404, detail="Unknown patient_id")
+    if event_log is not None:
+        event_log.discharge(patient_id)
+    return {"patient_id": patient_id, "status": "discharged"}
 
 if __name__ == "__main__":
     import uvicorn
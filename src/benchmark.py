@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Ensure src is in path
+sys.path.append(os.path.dirname(__file__))
+
+from inference import SepsisPredictor
+from clinical_rules import apply_clinical_rules
+
+# --- CONFIGURATION ---
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'sepsis_xgboost.pkl')
+
+# Raw columns of the training CSV: (mean, sd, fraction missing), roughly as in the
+# PhysioNet 2019 hourly data - vitals mostly present, labs mostly missing
+RAW_COLUMNS = {
+    'HR': (84, 17, 0.10), 'O2Sat': (97, 3, 0.13), 'Temp': (37, 0.7, 0.66),
+    'SBP': (123, 23, 0.15), 'MAP': (82, 16, 0.12), 'DBP': (64, 14, 0.31),
+    'Resp': (18.7, 5, 0.15), 'EtCO2': (33, 8, 0.96),
+    'BaseExcess': (-0.7, 4, 0.95), 'HCO3': (24, 4, 0.96), 'FiO2': (0.55, 11, 0.92),
+    'pH': (7.38, 0.07, 0.93), 'PaCO2': (41, 9, 0.94), 'SaO2': (92.6, 11, 0.97),
+    'AST': (260, 850, 0.98), 'BUN': (23, 20, 0.93), 'Alkalinephos': (102, 120, 0.98),
+    'Calcium': (7.5, 2, 0.94), 'Chloride': (105, 6, 0.95), 'Creatinine': (1.5, 1.8, 0.94),
+    'Bilirubin_direct': (1.8, 3.8, 0.998), 'Glucose': (136, 51, 0.83),
+    'Lactate': (2.6, 2.4, 0.97), 'Magnesium': (2.0, 0.4, 0.94), 'Phosphate': (3.5, 1.4, 0.96),
+    'Potassium': (4.1, 0.6, 0.91), 'Bilirubin_total': (2.1, 4.3, 0.99),
+    'TroponinI': (8.3, 24, 0.99), 'Hct': (30.8, 5.5, 0.91), 'Hgb': (10.4, 2, 0.93),
+    'PTT': (41, 26, 0.97), 'WBC': (11.4, 7.7, 0.94), 'Fibrinogen': (287, 153, 0.99),
+    'Platelets': (196, 103, 0.94),
+}
+
+# Feature keys an API client sends for one reading
+PAYLOAD_KEYS = ['HR', 'SBP', 'MAP', 'O2Sat', 'Temp', 'Resp', 'Lactate', 'WBC', 'Age', 'ICULOS']
+
+def synthetic_dataset(n_rows, seed=0, hours_per_patient=40):
+    """Hourly rows in the training CSV layout (sorted by patient and hour)."""
+    rng = np.random.default_rng(seed)
+    n_patients = max(1, n_rows // hours_per_patient)
+    patient = np.sort(rng.integers(0, n_patients, n_rows))
+    starts = np.r_[True, patient[1:] != patient[:-1]]
+    rows = np.arange(n_rows)
+    hour = rows - np.maximum.accumulate(np.where(starts, rows, 0))
+
+    df = pd.DataFrame({'Unnamed: 0': rows, 'Hour': hour})
+    for col, (mean, sd, missing) in RAW_COLUMNS.items():
+        values = rng.normal(mean, sd, n_rows)
+        values[rng.random(n_rows) < missing] = np.nan
+        df[col] = values
+    per_patient = lambda values: values[patient]
+    df['Age'] = per_patient(rng.uniform(18, 95, n_patients).round())
+    df['Gender'] = per_patient(rng.integers(0, 2, n_patients).astype(float))
+    unit = per_patient(rng.integers(0, 3, n_patients))
+    df['Unit1'] = np.where(unit == 2, np.nan, (unit == 0).astype(float))
+    df['Unit2'] = np.where(unit == 2, np.nan, (unit == 1).astype(float))
+    df['HospAdmTime'] = per_patient(-rng.exponential(50, n_patients))
+    df['ICULOS'] = hour + 1.0
+    df['SepsisLabel'] = (rng.random(n_rows) < 0.02).astype(int)
+    df['Patient_ID'] = patient
+    return df
+
+def synthetic_payloads(n, seed=0):
+    """API-style reading dicts with missing keys dropped, as bedside devices send them."""
+    df = synthetic_dataset(n, seed=seed)
+    payloads = []
+    for rec in df[PAYLOAD_KEYS].to_dict('records'):
+        payloads.append({k: v for k, v in rec.items() if v == v})
+    return payloads
+
+def latency_stats(timings):
+    """Percentiles (ms) and throughput from per-call timings in seconds."""
+    t = np.asarray(timings) * 1000.0
+    total = float(np.sum(timings))
+    return {
+        "calls": len(t),
+        "p50_ms": float(np.percentile(t, 50)),
+        "p95_ms": float(np.percentile(t, 95)),
+        "p99_ms": float(np.percentile(t, 99)),
+        "mean_ms": float(t.mean()),
+        "requests_per_sec": len(t) / total if total > 0 else None
+    }
+
+def time_calls(fn, items, warmup=20):
+    for item in items[:warmup]:
+        fn(item)
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    return latency_stats(timings)
+
+def bench_predict(predictor, payloads):
+    return time_calls(predictor.predict, payloads)
+
+def bench_rules(payloads, seed=0):
+    rng = np.random.default_rng(seed)
+    cases = list(zip(rng.random(len(payloads)).tolist(), payloads))
+    return time_calls(lambda case: apply_clinical_rules(*case), cases)
+
+def bench_explain(predictor, payloads, batch_sizes=(1, 64, 500), repeats=5):
+    """Extra cost of explain_batch over predict_batch per batch size (no caches)."""
+    if predictor.booster is None:
+        return None
+    cache, explain_cache = predictor.cache, predictor.explain_cache
+    predictor.cache = predictor.explain_cache = None
+    results = []
+    try:
+        for n in batch_sizes:
+            batch = payloads[:n]
+            row = {"rows": len(batch)}
+            for name, fn in (("predict_ms", lambda: predictor.predict_batch(batch)),
+                             ("explain_ms", lambda: predictor.explain_batch(batch)),
+                             ("explain_exact_ms", lambda: predictor.explain_batch(batch, exact=True))):
+                fn()
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    fn()
+                row[name] = (time.perf_counter() - start) / repeats * 1000.0
+            results.append(row)
+    finally:
+        predictor.cache, predictor.explain_cache = cache, explain_cache
+    return results
+
+def bench_api(payloads, model_path=MODEL_PATH):
+    """In-process POST /predict through the FastAPI test client."""
+    from fastapi.testclient import TestClient
+    os.environ.setdefault("SEPSIS_MODEL_PATH", model_path)
+    import api
+    with TestClient(api.app) as client, contextlib.redirect_stdout(io.StringIO()):
+        # The model loads in the background after startup; wait for readiness
+        while client.get("/ready").status_code == 503 and api.model_state["status"] == "loading":
+            time.sleep(0.05)
+        if api.registry.active is None:
+            return None
+        return time_calls(lambda p: client.post("/predict", json=p), payloads)
+
+def bench_api_formats(payloads, model_path=MODEL_PATH, batch_size=500, repeats=10):
+    """POST /predict/batch (JSON rows) vs /predict/columns per installed columnar format."""
+    from fastapi.testclient import TestClient
+    os.environ.setdefault("SEPSIS_MODEL_PATH", model_path)
+    import api
+    import columnar
+    batch = payloads[:batch_size]
+    names = sorted({k for p in batch for k in p})
+    columns = {k: np.array([p.get(k, np.nan) for p in batch], dtype=np.float64) for k in names}
+    requests = [("json_rows", "/predict/batch", {"json": {"patients": batch}})]
+    for fmt, media in columnar.CONTENT_TYPES.items():
+        if columnar.available(fmt):
+            requests.append((f"{fmt}_columns", "/predict/columns", {
+                "content": columnar.encode(columns, fmt), "headers": {"content-type": media}
+            }))
+    with TestClient(api.app) as client, contextlib.redirect_stdout(io.StringIO()):
+        while client.get("/ready").status_code == 503 and api.model_state["status"] == "loading":
+            time.sleep(0.05)
+        if api.registry.active is None:
+            return None
+        results = {"rows": len(batch)}
+        for name, path, kwargs in requests:
+            client.post(path, **kwargs)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                client.post(path, **kwargs)
+            results[f"{name}_ms"] = (time.perf_counter() - start) / repeats * 1000.0
+        return results
+
+def _preprocess_child(n_rows, seed, fast, conn):
+    from data_loader import DataLoader
+    df = synthetic_dataset(n_rows, seed=seed)
+    loader = DataLoader(None)
+    loader.raw_df = df
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.preprocess(fast=fast)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((elapsed, baseline_kb, peak_kb))
+    conn.close()
+
+def bench_preprocess(sizes, fast=True, seed=0):
+    """
+    DataLoader.preprocess rows/sec and peak RSS per dataset size.
+    Each size runs in its own process, as ru_maxrss only ever grows.
+    """
+    ctx = multiprocessing.get_context('fork')
+    results = []
+    for n_rows in sizes:
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_preprocess_child, args=(n_rows, seed, fast, child_conn))
+        proc.start()
+        elapsed, baseline_kb, peak_kb = parent_conn.recv()
+        proc.join()
+        results.append({
+            "rows": n_rows,
+            "fast": fast,
+            "seconds": elapsed,
+            "rows_per_sec": n_rows / elapsed,
+            "peak_rss_mb": peak_kb / 1024.0,
+            "preprocess_rss_mb": max(0, peak_kb - baseline_kb) / 1024.0
+        })
+        print(f"  preprocess(fast={fast}) {n_rows:>9,} rows: {n_rows / elapsed:,.0f} rows/s, "
+              f"peak RSS {peak_kb / 1024.0:.0f} MB")
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(__file__) or '.',
+            capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+        "platform": platform.platform()
+    }
+
+def run_benchmarks(n_requests=2000, sizes=(10_000, 100_000, 500_000), model_path=MODEL_PATH):
+    results = {"environment": environment(), "n_requests": n_requests}
+    payloads = synthetic_payloads(n_requests)
+
+    print(f"Loading Model from {model_path}...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor = SepsisPredictor(model_path)
+
+    print("Benchmarking SepsisPredictor.predict...")
+    results["predict"] = bench_predict(predictor, payloads)
+    print("Benchmarking SepsisPredictor.explain_batch...")
+    results["explain"] = bench_explain(predictor, payloads)
+    print("Benchmarking apply_clinical_rules...")
+    results["clinical_rules"] = bench_rules(payloads)
+    print("Benchmarking POST /predict (in-process)...")
+    results["api_predict"] = bench_api(payloads, model_path)
+    print("Benchmarking POST /predict/batch vs /predict/columns...")
+    results["api_formats"] = bench_api_formats(payloads, model_path)
+    print("Benchmarking DataLoader.preprocess...")
+    results["preprocess"] = bench_preprocess(sizes, fast=False) + bench_preprocess(sizes, fast=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency, throughput and memory benchmarks")
+    parser.add_argument("--requests", type=int, default=2000, help="Calls per latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10_000, 100_000, 500_000],
+                        help="Dataset sizes (rows) for the preprocess benchmark")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model file (.pkl or exported .npz)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.requests, args.sizes, args.model)
+
+    print(f"\n{'Benchmark':<18} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'req/s':>10}")
+    print("-" * 64)
+    for name in ('predict', 'clinical_rules', 'api_predict'):
+        r = results[name]
+        if r is not None:
+            print(f"{name:<18} | {r['p50_ms']:>8.3f} | {r['p95_ms']:>8.3f} | {r['p99_ms']:>8.3f} | {r['requests_per_sec']:>10,.0f}")
+
+    if results["explain"]:
+        print(f"\n{'Batch rows':<10} | {'predict ms':>10} | {'explain ms':>10} | {'exact ms':>10}")
+        print("-" * 50)
+        for r in results["explain"]:
+            print(f"{r['rows']:<10} | {r['predict_ms']:>10.2f} | {r['explain_ms']:>10.2f} | {r['explain_exact_ms']:>10.2f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n[SUCCESS] Benchmark results saved to '{args.output}'")
@@ -0,0 +1,238 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+# Ensure src is in path
+sys.path.append(os.path.dirname(__file__))
+
+from data_loader import DataLoader
+from inference import SepsisPredictor
+from clinical_rules import engine
+
+# --- CONFIGURATION ---
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'sepsis_xgboost.pkl')
+CHECKPOINT_FILE = '_checkpoint.json'
+
+# Source/reason labels per rule index; index -1 (no rule fired) picks the last entry
+SOURCES = np.array(["OVERRIDE"] * len(engine.reasons) + ["AI_DERIVED"])
+REASONS = np.array(engine.reasons + ["Model Prediction"])
+
+def have_parquet():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+# --- Worker side ---
+_predictor = None
+
+def _init_worker(model_path):
+    global _predictor
+    _predictor = SepsisPredictor(model_path)
+
+def _part_path(out_dir, index, fmt):
+    return os.path.join(out_dir, f"part-{index:05d}.{fmt}")
+
+def process_part(index, chunk, carry, medians, out_dir, fmt):
+    """Runs the feature pipeline on one raw CSV chunk (see DataLoader.stream_chunks), then score_part."""
+    start = time.perf_counter()
+    loader = DataLoader(None)
+    loader.medians = medians
+    index, n_rows, _ = score_part(index, loader.process_chunk(chunk, carry), out_dir, fmt)
+    return index, n_rows, time.perf_counter() - start
+
+def score_part(index, chunk, out_dir, fmt):
+    """Scores one processed chunk, applies the clinical rules and writes its part file atomically."""
+    start = time.perf_counter()
+    X = chunk.reindex(columns=_predictor.feature_names).to_numpy(dtype=np.float32)
+    F = chunk.reindex(columns=engine.features).to_numpy(dtype=np.float64)
+    patient_ids = chunk['Patient_ID'].astype(str).to_numpy(dtype=str)
+    hours = chunk['Hour'].to_numpy()
+    probs = _predictor.score(X)
+    final, rule_index = engine.evaluate(probs, F)
+    columns = {
+        'Patient_ID': patient_ids,
+        'Hour': hours,
+        'probability': probs.astype(np.float32),
+        'final_probability': final.astype(np.float32),
+        'source': SOURCES[rule_index],
+        'reason': REASONS[rule_index]
+    }
+
+    path = _part_path(out_dir, index, fmt)
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        pd.DataFrame(columns).to_parquet(tmp, index=False)
+    else:
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **columns)
+    os.replace(tmp, path)
+    return index, len(X), time.perf_counter() - start
+
+# --- Driver side ---
+def chunk_tasks(loader, chunksize, medians=None):
+    """
+    Yields a (worker task, args) pair per chunk. CSV: the raw chunk and the state
+    carried into it (DataLoader.stream_chunks, same features as preprocess()), so
+    the feature pipeline runs in the workers and the driver only parses the file.
+    Parquet: chunks of an in-memory preprocess(fast=True) in the driver.
+    """
+    if loader.filepath.endswith('.parquet'):
+        loader.raw_df = pd.read_parquet(loader.filepath)
+        df = loader.preprocess(fast=True)
+        for start in range(0, len(df), chunksize):
+            yield score_part, (df.iloc[start:start + chunksize],)
+    else:
+        for chunk, carry in loader.stream_chunks(chunksize, medians):
+            yield process_part, (chunk, carry, loader.medians)
+
+def load_checkpoint(out_dir, config):
+    """Checkpoint of a previous run with the same input and settings, or None."""
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('config') != config:
+        raise ValueError(
+            f"{out_dir} holds a run with different settings or input; "
+            "use another --output or --restart"
+        )
+    return checkpoint
+
+def save_checkpoint(out_dir, checkpoint):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def bulk_score(input_path, out_dir, model_path=MODEL_PATH, chunksize=100_000,
+               workers=None, fmt=None, restart=False):
+    """
+    Scores every row of a cohort file into out_dir/part-NNNNN.<fmt>, one part per chunk.
+    Parts are written atomically, so a rerun skips the ones already on disk.
+    Returns the number of rows scored in this run.
+    """
+    fmt = fmt or ('parquet' if have_parquet() else 'npz')
+    workers = workers or os.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+
+    stat = os.stat(input_path)
+    config = {
+        'input': os.path.abspath(input_path),
+        'input_size': stat.st_size,
+        'input_mtime': stat.st_mtime,
+        'model': os.path.abspath(model_path),
+        'chunksize': chunksize,
+        'format': fmt
+    }
+    checkpoint = None
+    if restart:
+        for path in glob.glob(os.path.join(out_dir, 'part-*')):
+            os.remove(path)
+    else:
+        checkpoint = load_checkpoint(out_dir, config)
+    if checkpoint is None:
+        checkpoint = {'config': config, 'medians': None, 'completed': False}
+        save_checkpoint(out_dir, checkpoint)
+    elif checkpoint['completed']:
+        print(f"{out_dir} is already complete (use --restart to score again)")
+        return 0
+
+    # Fill medians from the previous run skip the first streaming pass
+    medians = checkpoint['medians']
+    if medians is not None:
+        medians = {c: np.float32(v) for c, v in medians.items()}
+
+    print(f"Scoring {input_path} -> {out_dir} ({workers} workers, {fmt} parts)")
+    # Load the model here; forked workers share it, spawned workers load their own
+    _init_worker(model_path)
+    if _predictor.booster is not None and workers > 1:
+        # One core per process; the pool provides the parallelism
+        _predictor.booster.set_param({'nthread': 1})
+    if 'fork' in multiprocessing.get_all_start_methods():
+        pool_args = {'mp_context': multiprocessing.get_context('fork')}
+    else:
+        pool_args = {'initializer': _init_worker, 'initargs': (model_path,)}
+
+    start = time.perf_counter()
+    scored_rows = skipped_rows = 0
+    in_flight = set()
+    with ProcessPoolExecutor(workers, **pool_args) as pool:
+
+        def drain(block):
+            """Collects finished parts (waiting for at least one if block)."""
+            nonlocal scored_rows
+            if block:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            else:
+                done = {f for f in in_flight if f.done()}
+            for future in done:
+                in_flight.discard(future)
+                index, n_rows, seconds = future.result()
+                scored_rows += n_rows
+                elapsed = time.perf_counter() - start
+                print(f"  part {index:05d}: {n_rows:,} rows in {seconds:.2f}s "
+                      f"({scored_rows / elapsed:,.0f} rows/sec overall)")
+
+        loader = DataLoader(input_path)
+        for index, (task, args) in enumerate(chunk_tasks(loader, chunksize, medians)):
+            if checkpoint['medians'] is None and task is process_part:
+                checkpoint['medians'] = {c: float(v) for c, v in loader.medians.items()}
+                save_checkpoint(out_dir, checkpoint)
+            # Parts already on disk: their chunk is read (for the carry) but not processed
+            if os.path.exists(_part_path(out_dir, index, fmt)):
+                skipped_rows += len(args[0])
+                continue
+
+            in_flight.add(pool.submit(task, index, *args, out_dir, fmt))
+
+            # Bounded queue: at most two chunks per worker in memory
+            drain(block=len(in_flight) >= 2 * workers)
+
+        while in_flight:
+            drain(block=True)
+
+    checkpoint['completed'] = True
+    save_checkpoint(out_dir, checkpoint)
+    elapsed = time.perf_counter() - start
+    if skipped_rows:
+        print(f"Resumed: {skipped_rows:,} rows already scored")
+    print(f"[SUCCESS] Scored {scored_rows:,} rows in {elapsed:.1f}s "
+          f"({scored_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    return scored_rows
+
+def read_scores(out_dir):
+    """Concatenates the part files of a bulk_score run into one DataFrame."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(out_dir, 'part-*'))):
+        if path.endswith('.parquet'):
+            frames.append(pd.read_parquet(path))
+        elif path.endswith('.npz'):
+            with np.load(path) as f:
+                frames.append(pd.DataFrame({k: f[k] for k in f.files}))
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every row of a cohort CSV/Parquet file")
+    parser.add_argument("input", help="Cohort file (.csv sorted by Patient_ID and Hour, or .parquet)")
+    parser.add_argument("--output", default="bulk_scores", help="Output directory for the part files")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model file (.pkl or exported .npz)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk / part file")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument("--format", choices=['parquet', 'npz'], default=None,
+                        help="Part file format (default: parquet if pyarrow is installed, else npz)")
+    parser.add_argument("--restart", action="store_true", help="Ignore and overwrite a previous run")
+    args = parser.parse_args()
+
+    bulk_score(args.input, args.output, args.model, args.chunksize,
+               args.workers, args.format, args.restart)
@@ -0,0 +1,118 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# --- CONFIGURATION ---
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(SRC_DIR, 'sepsis_xgboost.pkl')
+IMPORT_BUDGET_S = 0.8   # python -X importtime, cumulative time of `import api`
+LIVE_BUDGET_S = 2.0     # process start -> first 200 on /
+READY_BUDGET_S = 10.0   # process start -> first 200 on /ready
+
+def import_times(module="api"):
+    """
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter.
+    Returns (seconds for the module, [(cumulative seconds, name)] of its direct
+    imports, slowest first).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # Lines look like "import time: self [us] | cumulative | <2 spaces per level>package",
+    # children listed before their parent
+    total = None
+    children = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 0 and name.strip() == module:
+            total = seconds
+        elif depth == 1 and total is None:
+            children.append((seconds, name.strip()))
+        elif depth == 0:
+            children = []
+    return total, sorted(children, reverse=True)
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for(url, start, timeout):
+    """Seconds from start until url answers 200, or None on timeout."""
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return None
+
+def startup_times(model_path=MODEL_PATH, timeout=60.0):
+    """Starts the API under uvicorn and times the first healthy / and /ready responses."""
+    port = _free_port()
+    env = dict(os.environ, SEPSIS_MODEL_PATH=model_path)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        live = _wait_for(f"http://127.0.0.1:{port}/", start, timeout)
+        ready = _wait_for(f"http://127.0.0.1:{port}/ready", start, timeout)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return live, ready
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time and startup budget check for the API")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_S, help="Max seconds for `import api`")
+    parser.add_argument("--live-budget", type=float, default=LIVE_BUDGET_S, help="Max seconds to the first 200 on /")
+    parser.add_argument("--ready-budget", type=float, default=READY_BUDGET_S, help="Max seconds to the first 200 on /ready")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model file (.pkl or exported .npz)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--skip-server", action="store_true", help="Only check the import time")
+    args = parser.parse_args()
+
+    failures = []
+
+    # 1. Import time of the API module
+    total, slowest = import_times("api")
+    print(f"import api: {total:.3f}s (budget {args.import_budget:.3f}s)")
+    for seconds, name in slowest[:args.top]:
+        print(f"  {seconds:>8.3f}s  {name}")
+    if total > args.import_budget:
+        failures.append(f"import api took {total:.3f}s > {args.import_budget:.3f}s")
+
+    # 2. Time to the first healthy / (liveness) and /ready (model loaded)
+    if not args.skip_server:
+        live, ready = startup_times(args.model)
+        for name, seconds, budget in (("/", live, args.live_budget), ("/ready", ready, args.ready_budget)):
+            if seconds is None:
+                print(f"first 200 on {name}: timed out")
+                failures.append(f"{name} never answered 200")
+                continue
+            print(f"first 200 on {name}: {seconds:.3f}s (budget {budget:.3f}s)")
+            if seconds > budget:
+                failures.append(f"first 200 on {name} took {seconds:.3f}s > {budget:.3f}s")
+
+    if failures:
+        for f in failures:
+            print(f"[FAIL] {f}")
+        sys.exit(1)
+    print("[SUCCESS] Startup within budget")
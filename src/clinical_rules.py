@@ -1,43 +1,140 @@
+import numpy as np
 
-def apply_clinical_rules(prob, features):
-    """
-    Applies deterministic medical rules to override AI probability.
-    
-    Args:
-        prob (float): The raw probability from the XGBoost model.
-        features (dict): The dictionary of patient vitals/labs.
-        
-    Returns:
-        tuple: (modified_prob, status, reason)
-    """
-    final_prob = prob
-    reason = "Model Prediction"
-    status = "AI_DERIVED"
+# Deterministic medical rules that override the AI probability.
+# One row per rule; the first rule (lowest priority number) whose condition holds
+# and whose model guard passes wins. Adding a rule means adding a row here.
+#
+# max_model_prob: override only if the model probability is below it (None = always)
+RULES = [
+    # priority, feature, op, threshold, override_prob, max_model_prob, reason
 
     # RULE 1: Critical Lactate (Septic Shock Indicator)
     # Rationale: Lactate > 4.0 mmol/L is independent predictor of mortality
-    lactate = features.get('Lactate')
-    if lactate is not None and lactate >= 4.0:
-        return 0.95, "OVERRIDE", "Critical Lactate (>= 4.0)"
+    (1, 'Lactate', '>=', 4.0, 0.95, None, "Critical Lactate (>= 4.0)"),
 
     # RULE 2: Severe Bradycardia (Agonal State)
     # Rationale: HR < 40 is often pre-terminal, but AI mistakes it for 'athletic'
-    hr = features.get('HR')
-    if hr is not None and hr < 40:
-        return 0.90, "OVERRIDE", "Severe Bradycardia (HR < 40)"
-        
+    (2, 'HR', '<', 40, 0.90, None, "Severe Bradycardia (HR < 40)"),
+
     # RULE 3: Severe Hypoxia (Safety Net for Respiratory Failure)
-    o2 = features.get('O2Sat')
-    if o2 is not None and o2 < 85:
-         # Only override if the model missed it (prob < 0.7)
-         if prob < 0.7:
-            return 0.85, "OVERRIDE", "Severe Hypoxia (SpO2 < 85%)"
+    # Only override if the model missed it (prob < 0.7)
+    (3, 'O2Sat', '<', 85, 0.85, 0.7, "Severe Hypoxia (SpO2 < 85%)"),
 
     # RULE 4: Hypotensive Shock (Safety Net)
-    sbp = features.get('SBP')
-    if sbp is not None and sbp < 90:
-        # Override if model is asleep (prob < 0.22)
-        if prob < 0.22:
-            return 0.80, "OVERRIDE", "Severe Hypotension (SBP < 90)"
+    # Override if model is asleep (prob < 0.22)
+    (4, 'SBP', '<', 90, 0.80, 0.22, "Severe Hypotension (SBP < 90)"),
+]
+
+OPS = {
+    '<': np.less, '<=': np.less_equal,
+    '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal
+}
+
+class RuleEngine:
+    """
+    The rule table compiled into arrays: all rules are evaluated over an
+    N-patient matrix with one mask per rule, and first-match-wins is resolved
+    with an argmax over the rule axis.
+    """
+    def __init__(self, rules=RULES):
+        rules = sorted(rules, key=lambda r: r[0])
+        for r in rules:
+            if r[2] not in OPS:
+                raise ValueError(f"Unknown comparator {r[2]!r} in rule: {r[6]}")
+
+        # Features the rules read, and which column each rule compares
+        self.features = list(dict.fromkeys(r[1] for r in rules))
+        self.columns = np.array([self.features.index(r[1]) for r in rules], dtype=np.intp)
+        self.ops = [OPS[r[2]] for r in rules]
+        self.thresholds = np.array([r[3] for r in rules], dtype=np.float64)
+        self.override = np.array([r[4] for r in rules], dtype=np.float64)
+        self.guards = np.array([np.inf if r[5] is None else r[5] for r in rules], dtype=np.float64)
+        self.reasons = [r[6] for r in rules]
+
+    def matrix(self, batch):
+        """(N, n_features) float matrix of the rule inputs; missing or non-numeric = NaN."""
+        F = np.full((len(batch), len(self.features)), np.nan)
+        for j, name in enumerate(self.features):
+            col = [data.get(name) for data in batch]
+            try:
+                F[:, j] = [np.nan if val is None else val for val in col]
+            except (TypeError, ValueError):
+                # Slow path: coerce value by value
+                for i, val in enumerate(col):
+                    try:
+                        F[i, j] = float(val)
+                    except (TypeError, ValueError):
+                        pass
+        return F
+
+    def column_matrix(self, columns, n):
+        """matrix() for columnar input ({name: (N,) float array}); absent columns = NaN."""
+        F = np.full((n, len(self.features)), np.nan)
+        for j, name in enumerate(self.features):
+            if name in columns:
+                F[:, j] = columns[name]
+        return F
+
+    def evaluate(self, probs, F):
+        """
+        probs: (N,) model probabilities
+        F: (N, n_features) rule inputs (see matrix)
+        Returns: (final_probs, rule_index) with rule_index -1 where no rule fired
+        """
+        probs = np.asarray(probs, dtype=np.float64)
+        if not self.ops:
+            return probs.copy(), np.full(len(probs), -1)
+
+        # 1. One mask per rule: condition (NaN never matches) and model guard
+        fired = np.empty((len(self.ops), len(probs)), dtype=bool)
+        for k, op in enumerate(self.ops):
+            with np.errstate(invalid='ignore'):
+                fired[k] = op(F[:, self.columns[k]], self.thresholds[k])
+        fired &= probs[None, :] < self.guards[:, None]
 
-    return final_prob, status, reason
+        # 2. First match wins: first True along the rule axis (priority order)
+        rule_index = np.where(fired.any(axis=0), fired.argmax(axis=0), -1)
+        final = np.where(rule_index >= 0, self.override[rule_index], probs)
+        return final, rule_index
+
+    def apply_batch(self, probs, batch):
+        """Returns a (final_prob, status, reason) tuple per patient."""
+        final, rule_index = self.evaluate(probs, self.matrix(batch))
+        results = []
+        for p, k in zip(final.tolist(), rule_index.tolist()):
+            if k < 0:
+                results.append((p, "AI_DERIVED", "Model Prediction"))
+            else:
+                results.append((p, "OVERRIDE", self.reasons[k]))
+        return results
+
+engine = RuleEngine()
+
+def apply_clinical_rules_batch(probs, batch):
+    """Vectorized apply_clinical_rules over N patients (list of feature dicts)."""
+    return engine.apply_batch(probs, batch)
+
+def apply_clinical_rules_columns(probs, columns):
+    """
+    apply_clinical_rules over columnar input ({name: (N,) float array}).
+    Returns (final_probs, reasons) arrays, reason None where the model decides.
+    """
+    final, rule_index = engine.evaluate(probs, engine.column_matrix(columns, len(probs)))
+    reasons = np.array(engine.reasons + [None], dtype=object)[rule_index]
+    return final, reasons
+
+def apply_clinical_rules(prob, features):
+    """
+    Applies deterministic medical rules to override AI probability.
+
+    Args:
+        prob (float): The raw probability from the XGBoost model.
+        features (dict): The dictionary of patient vitals/labs.
+
+    Returns:
+        tuple: (modified_prob, status, reason)
+    """
+    final_prob, status, reason = engine.apply_batch([prob], [features])[0]
+    # Model predictions pass through unchanged (same type as given)
+    return (prob if status == "AI_DERIVED" else final_prob), status, reason
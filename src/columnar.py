@@ -0,0 +1,180 @@
+import importlib
+import json
+
+import numpy as np
+
+# Columnar request/response formats of POST /predict/columns by media type.
+# A payload is one column per input (HR, SBP, ..., Lactate, Age, ...), plus the
+# optional patient_id (strings) and timestamp (epoch seconds) columns:
+#   arrow:   Arrow IPC stream (one or more record batches), needs pyarrow
+#   msgpack: map of column name -> array; numeric columns may also be binary
+#            little-endian float32/float64 buffers. Needs msgpack
+#   json:    the same map as a JSON object
+MEDIA_TYPES = {
+    'application/vnd.apache.arrow.stream': 'arrow',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+    'application/json': 'json',
+}
+CONTENT_TYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'msgpack': 'application/msgpack',
+    'json': 'application/json',
+}
+# Optional dependencies, imported on first use
+LIBRARIES = {'arrow': 'pyarrow', 'msgpack': 'msgpack'}
+
+STRING_COLUMNS = ('patient_id',)
+
+class ColumnarError(ValueError):
+    """Malformed columnar payload (HTTP 422)."""
+
+class FormatUnavailable(RuntimeError):
+    """Format whose library is not installed (HTTP 415 / 406)."""
+
+def _library(fmt, submodule=None):
+    name = LIBRARIES[fmt]
+    try:
+        module = importlib.import_module(name)
+        if submodule:
+            importlib.import_module(f"{name}.{submodule}")
+    except ImportError:
+        raise FormatUnavailable(f"{CONTENT_TYPES[fmt]} needs the '{name}' package")
+    return module
+
+def media_format(content_type):
+    """Format name of a Content-Type header value, or None."""
+    if not content_type:
+        return None
+    return MEDIA_TYPES.get(content_type.split(';')[0].strip().lower())
+
+def available(fmt):
+    if fmt in LIBRARIES:
+        try:
+            _library(fmt)
+        except FormatUnavailable:
+            return False
+    return True
+
+def accepted_format(accept, default):
+    """
+    Response format for an Accept header: the most preferred supported media type,
+    `default` (the request's format) for none or */*. None if nothing acceptable.
+    """
+    if not accept:
+        return default
+    ranges = []
+    for i, part in enumerate(accept.split(',')):
+        fields = [f.strip() for f in part.split(';')]
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranges.append((-q, i, fields[0].lower()))
+    for _, _, media in sorted(ranges):
+        if media in ('*/*', 'application/*'):
+            return default
+        fmt = MEDIA_TYPES.get(media)
+        if fmt is not None and available(fmt):
+            return fmt
+    return None
+
+def _numeric(name, values):
+    try:
+        col = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ColumnarError(f"Column '{name}' is not numeric")
+    if col.ndim != 1:
+        raise ColumnarError(f"Column '{name}' is not a flat array")
+    return col
+
+def _decode_arrow(body):
+    pa = _library('arrow', 'ipc')
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ColumnarError(f"Invalid Arrow IPC stream: {e}")
+    columns = {}
+    for name, col in zip(table.column_names, table.columns):
+        if name in STRING_COLUMNS:
+            # Patients are keyed by str (as in the JSON/MessagePack payloads and the event log)
+            columns[name] = [None if v is None else str(v) for v in col.to_pylist()]
+            continue
+        if pa.types.is_timestamp(col.type):
+            # Epoch seconds, like the JSON timestamp field
+            col = col.cast(pa.timestamp('us', tz=col.type.tz)).cast(pa.int64())
+            columns[name] = col.to_numpy(zero_copy_only=False).astype(np.float64) / 1e6
+            continue
+        try:
+            col = col.cast(pa.float64())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            raise ColumnarError(f"Column '{name}' is not numeric")
+        # Nulls come out as NaN (missing)
+        columns[name] = col.to_numpy(zero_copy_only=False)
+    return columns
+
+def _decode_map(data):
+    if not isinstance(data, dict):
+        raise ColumnarError("Payload must be a map of column name -> array")
+    columns = {}
+    for name, values in data.items():
+        if not isinstance(values, (list, bytes, bytearray)):
+            raise ColumnarError(f"Column '{name}' is not an array")
+        if name in STRING_COLUMNS:
+            columns[name] = [None if v is None else str(v) for v in values]
+        elif isinstance(values, (bytes, bytearray)):
+            # Binary buffer: float32, or float64 for the timestamp column
+            dtype = '<f8' if name == 'timestamp' else '<f4'
+            if len(values) % np.dtype(dtype).itemsize:
+                raise ColumnarError(f"Column '{name}' is not a {dtype} buffer")
+            columns[name] = np.frombuffer(values, dtype=dtype).astype(np.float64)
+        else:
+            columns[name] = _numeric(name, [np.nan if v is None else v for v in values])
+    return columns
+
+def decode(body, fmt):
+    """
+    Request body -> ({column: float64 array or list of str}, n_rows).
+    Raises ColumnarError for malformed payloads.
+    """
+    if fmt == 'arrow':
+        columns = _decode_arrow(body)
+    elif fmt == 'msgpack':
+        msgpack = _library('msgpack')
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except ValueError as e:
+            raise ColumnarError(f"Invalid MessagePack: {e}")
+        columns = _decode_map(data)
+    else:
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise ColumnarError(f"Invalid JSON: {e}")
+        columns = _decode_map(data)
+
+    lengths = {len(col) for col in columns.values()}
+    if len(lengths) > 1:
+        raise ColumnarError(f"Columns have different lengths: {sorted(lengths)}")
+    return columns, lengths.pop() if lengths else 0
+
+def encode(columns, fmt):
+    """Response columns ({name: array or list}) -> body bytes in the given format."""
+    if fmt == 'arrow':
+        pa = _library('arrow', 'ipc')
+        table = pa.table({name: pa.array(col) for name, col in columns.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    plain = {name: col.tolist() if isinstance(col, np.ndarray) else list(col)
+             for name, col in columns.items()}
+    if fmt == 'msgpack':
+        return _library('msgpack').packb(plain)
+    return json.dumps(plain).encode()
@@ -2,12 +2,93 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import GroupShuffleSplit
 import os
+import time
+
+from feature_store import FeatureCache
+from features import VITALS, WINDOW, engineer_column, patient_starts, segment_positions
+
+# Narrowed dtypes for streaming ingestion; every other column is read as float32
+INT_COLUMNS = {'Unnamed: 0': 'int64', 'Hour': 'int32', 'SepsisLabel': 'int8'}
+ID_COLUMN_DTYPE = 'category'
+
+def _ffill_segments(values, rows, seg_start):
+    """
+    Forward fill that resets at patient boundaries.
+    Returns (filled, leak) where leak marks rows with no earlier value in their segment.
+    """
+    missing = np.isnan(values)
+    if not missing.any():
+        return values, missing
+    last_valid = np.maximum.accumulate(np.where(missing, -1, rows))
+    # Values from a previous patient must not leak across the boundary
+    leak = last_valid < seg_start
+    values = values[np.maximum(last_valid, 0)]
+    values[leak] = np.nan
+    return values, leak
+
+def _median_from_counts(values, counts):
+    """Exact median from sorted unique values and their counts (pandas semantics)."""
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+    cum = np.cumsum(counts)
+    lo = values[np.searchsorted(cum, (total - 1) // 2, side='right')]
+    hi = values[np.searchsorted(cum, total // 2, side='right')]
+    return (float(lo) + float(hi)) / 2
+
+class FeatureSplits:
+    """
+    Train/Val/Test partitions as views over one contiguous float32 feature matrix.
+    Rows are stored partition by partition (train, val, test), so every
+    partition is a slice of X and no partition is a copy.
+    The matrix can live in memory or in a memory-mapped .npy file.
+
+    train_idx / val_idx / test_idx: positional rows of processed_df in each partition
+    """
+    def __init__(self, X, y, feature_names, train_idx, val_idx, test_idx):
+        self.X = X
+        self.y = y
+        self.feature_names = feature_names
+        self.train_idx = train_idx
+        self.val_idx = val_idx
+        self.test_idx = test_idx
+        n_train, n_val = len(train_idx), len(val_idx)
+        self.slices = {
+            'train': slice(0, n_train),
+            'val': slice(n_train, n_train + n_val),
+            'test': slice(n_train + n_val, len(X)),
+        }
+
+    def positions(self, idx):
+        """Rows of X holding the given positional rows of processed_df."""
+        order = np.concatenate([self.train_idx, self.val_idx, self.test_idx])
+        rows = np.empty(len(order), dtype=np.intp)
+        rows[order] = np.arange(len(order))
+        return rows[idx]
+
+    def part(self, name):
+        """Returns (X_view, y_view) of 'train', 'val' or 'test'."""
+        sl = self.slices[name]
+        return self.X[sl], self.y[sl]
+
+    def dmatrix(self, name, quantile=False, ref=None, nthread=-1):
+        """
+        XGBoost DMatrix (or QuantileDMatrix) built straight from the view.
+        For QuantileDMatrix, pass the training matrix as ref for val/test.
+        """
+        import xgboost as xgb
+        X, y = self.part(name)
+        if quantile:
+            return xgb.QuantileDMatrix(X, label=y, feature_names=self.feature_names,
+                                       ref=ref, nthread=nthread)
+        return xgb.DMatrix(X, label=y, feature_names=self.feature_names, nthread=nthread)
 
 class DataLoader:
     def __init__(self, filepath):
         self.filepath = filepath
         self.raw_df = None
         self.processed_df = None
+        self.medians = None  # fill values of the streaming path (see load_data_stream)
 
     def load_data(self):
         """Loads valid columns from the dataset."""
@@ -17,13 +98,41 @@ class DataLoader:
         print(f"Data loaded: {self.raw_df.shape}")
         return self.raw_df
 
-    def preprocess(self):
+    def load_processed(self, cache_dir=None):
+        """
+        load_data() + preprocess(fast=True), through the on-disk feature cache.
+        A hit (same file content, same feature version) is memory-mapped instead of recomputed.
+        """
+        cache = FeatureCache(cache_dir) if cache_dir else FeatureCache()
+        start_time = time.perf_counter()
+        key = cache.key(self.filepath)
+        df = cache.load(key)
+        if df is not None:
+            print(f"Loaded cached features {key} in {time.perf_counter() - start_time:.2f}s: {df.shape}")
+            self.processed_df = df
+            return df
+
+        print(f"Feature cache miss ({key}), preprocessing...")
+        self.load_data()
+        self.preprocess(fast=True)
+        self.raw_df = None
+        cache.save(key, self.processed_df, source=os.path.abspath(self.filepath))
+        print(f"Saved features to {cache.path(key)}")
+        return self.processed_df
+
+    def preprocess(self, fast=False):
         """
         1. Sort by Patient and Time
         2. Impute Missing Values (Forward Fill -> Median Fill)
         3. Feature Engineering (Lags, Deltas, Rolling)
         4. Drop rows that couldn't be engineered (e.g., first few hours) or fill them
+
+        fast=True runs the same steps with segmented NumPy operations instead of
+        groupby passes (identical output, see _preprocess_fast).
         """
+        if fast:
+            return self._preprocess_fast()
+
         print("Preprocessing data...")
         df = self.raw_df.copy()
 
@@ -45,38 +154,254 @@ class DataLoader:
         df = df.fillna(df.median())
 
         # 2. Feature Engineering
-        print("Engineering Time-Series Features (Lags, Deltas, Rolling)...")
+        df = self._add_temporal_features(df, patient_starts(df['Patient_ID'].to_numpy()))
+
+        self.processed_df = df
+        print(f"Preprocessing complete. Features: {df.shape[1]}")
+        return self.processed_df
+
+    def _preprocess_fast(self):
+        """
+        Same output as preprocess(), for multi-million-row datasets:
+        one sort, patient boundaries as an index array, and segmented NumPy
+        forward fill instead of groupby passes. The raw frame is not copied;
+        each column is gathered once in sorted order.
+        """
+        print("Preprocessing data (fast mode)...")
+        start_time = time.perf_counter()
+        raw = self.raw_df
+
+        # 1. One stable sort by Patient and Time (skipped if the file is already sorted)
+        patient_ids = raw['Patient_ID'].to_numpy()
+        hours = raw['Hour'].to_numpy()
+        already_sorted = bool(np.all(
+            (patient_ids[1:] > patient_ids[:-1])
+            | ((patient_ids[1:] == patient_ids[:-1]) & (hours[1:] >= hours[:-1]))
+        ))
+        order = slice(None) if already_sorted else np.lexsort((hours, patient_ids))
+        patient_ids = patient_ids[order]
+        starts = patient_starts(patient_ids)
+        rows = np.arange(len(patient_ids))
+        # Index of the first row of each row's patient (segment start)
+        seg_start = np.maximum.accumulate(np.where(starts, rows, 0))
+
+        # 2. Imputation: forward fill within patient segments, then global median.
+        # Float columns are written straight into one pre-allocated block, so the
+        # frame is built without a consolidation copy.
+        print("Imputing missing values...")
+        float_cols = [c for c in raw.columns if c != 'Patient_ID' and raw[c].dtype.kind == 'f']
+        block = np.empty((len(float_cols), len(rows)))
+        for i, col in enumerate(float_cols):
+            values, leak = _ffill_segments(raw[col].to_numpy()[order], rows, seg_start)
+            if leak.any() and not leak.all():
+                values[leak] = np.nanmedian(values)
+            block[i] = values
+        df = pd.DataFrame(block.T, columns=float_cols, index=raw.index[order], copy=False)
+
+        # Other columns (ints, IDs) keep their dtype and position; Patient_ID goes last,
+        # as in the groupby path
+        for loc, col in enumerate(raw.columns.drop('Patient_ID')):
+            if col not in float_cols:
+                df.insert(loc, col, raw[col].to_numpy()[order])
+        df['Patient_ID'] = patient_ids
+
+        # 3. Feature Engineering
+        df = self._add_temporal_features(df, starts)
+
+        self.processed_df = df
+        elapsed = time.perf_counter() - start_time
+        print(f"Preprocessing complete. Features: {df.shape[1]} "
+              f"({len(df) / max(elapsed, 1e-9):,.0f} rows/sec)")
+        return self.processed_df
+
+    def column_schema(self):
+        """Narrowed dtype per CSV column: float32 values, small ints, categorical Patient_ID."""
+        columns = pd.read_csv(self.filepath, nrows=0).columns
+        schema = {}
+        for col in columns:
+            if col == 'Patient_ID':
+                schema[col] = ID_COLUMN_DTYPE
+            else:
+                schema[col] = INT_COLUMNS.get(col, 'float32')
+        return schema
+
+    def _read_chunks(self, chunksize, schema, usecols=None):
+        """Reads the CSV in chunks and checks it is sorted by Patient_ID and Hour."""
+        finished = set()
+        last_id, last_hour = None, None
+        reader = pd.read_csv(self.filepath, dtype=schema, usecols=usecols, chunksize=chunksize)
+        for chunk in reader:
+            ids = chunk['Patient_ID'].to_numpy()
+            hours = chunk['Hour'].to_numpy()
+            starts = patient_starts(ids)
+            segment_ids = ids[starts]
+            continues = ids[0] == last_id
+            new_ids = segment_ids[1:] if continues else segment_ids
+            hour_order_ok = np.all(starts[1:] | (hours[1:] >= hours[:-1]))
+            if continues and hours[0] < last_hour:
+                hour_order_ok = False
+            if (not hour_order_ok or len(set(segment_ids)) != len(segment_ids)
+                    or not finished.isdisjoint(new_ids)):
+                raise ValueError("Streaming mode needs the CSV sorted by Patient_ID and Hour")
+            if last_id is not None and not continues:
+                finished.add(last_id)
+            finished.update(segment_ids[:-1])
+            last_id, last_hour = ids[-1], hours[-1]
+            yield chunk
+
+    def compute_medians(self, chunksize=100_000):
+        """
+        First streaming pass: global median of each float column after the
+        per-patient forward fill (the values preprocess() fills gaps with).
+        Keeps only unique values + counts per column; charted vitals/labs have
+        limited precision, so this stays far smaller than the column itself.
+        """
+        schema = self.column_schema()
+        float_cols = [c for c, t in schema.items() if t == 'float32']
+        uniques = {c: (np.empty(0, dtype=np.float32), np.empty(0)) for c in float_cols}
+        pending = {c: [] for c in float_cols}
+        carry_id, carry_last = None, np.empty(len(float_cols), dtype=np.float32)
+        for chunk in self._read_chunks(chunksize, schema):
+            ids = chunk['Patient_ID'].to_numpy()
+            # The carried last row (if the patient continues) seeds the forward fill
+            k = 1 if ids[0] == carry_id else 0
+            ext_ids = np.concatenate([ids[:k], ids])
+            rows = np.arange(len(ext_ids))
+            seg_start = np.maximum.accumulate(np.where(patient_starts(ext_ids), rows, 0))
+            for i, col in enumerate(float_cols):
+                values = np.concatenate([carry_last[i:i + k], chunk[col].to_numpy()])
+                filled, _ = _ffill_segments(values, rows, seg_start)
+                filled = filled[k:]
+                chunk[col] = filled
+
+                pending[col].append(np.unique(filled[~np.isnan(filled)], return_counts=True))
+                # Merge lazily so repeated merges stay amortized O(n log n)
+                if sum(len(v) for v, _ in pending[col]) > max(len(uniques[col][0]), 1_000_000):
+                    uniques[col] = self._merge_counts([uniques[col]] + pending[col])
+                    pending[col] = []
+            carry_id = ids[-1]
+            carry_last = chunk[float_cols].iloc[-1].to_numpy(dtype=np.float32)
+
+        return {
+            c: _median_from_counts(*self._merge_counts([uniques[c]] + pending[c]))
+            for c in float_cols
+        }
+
+    @staticmethod
+    def _merge_counts(parts):
+        values, inverse = np.unique(np.concatenate([v for v, _ in parts]), return_inverse=True)
+        return values, np.bincount(inverse, weights=np.concatenate([c for _, c in parts]))
+
+    def load_data_stream(self, chunksize=100_000, medians=None):
+        """
+        Streaming alternative to load_data() + preprocess() for datasets that do not fit in RAM.
+        Reads the CSV in chunks with a narrowed schema (see column_schema) and yields
+        processed chunks with the same columns as preprocess(). The last hours of the
+        last patient are carried into the next chunk, so ffill, lags and rolling
+        windows are the same as on the whole file.
+
+        The file must be sorted by Patient_ID and Hour (as the PhysioNet/MIMIC extracts are).
+        medians: dict of column -> fill value; computed in a first streaming pass if None
+        """
+        n_rows = 0
+        for chunk, carry in self.stream_chunks(chunksize, medians):
+            df = self.process_chunk(chunk, carry)
+            n_rows += len(df)
+            yield df
+
+        print(f"Streaming complete. Rows: {n_rows}")
+
+    def stream_chunks(self, chunksize=100_000, medians=None):
+        """
+        load_data_stream() split in two, so the chunks can be processed in any order
+        (e.g. in worker processes): yields (raw chunk, carry), and process_chunk(chunk,
+        carry) returns the processed chunk. Only the carry is computed here, in file
+        order: the imputed last WINDOW-1 rows of the previous chunk's last patient,
+        from that patient's rows alone.
+        """
+        print(f"Streaming data from {self.filepath} (chunks of {chunksize} rows)...")
+        schema = self.column_schema()
+        if medians is None:
+            print("Computing fill medians (first pass)...")
+            medians = self.compute_medians(chunksize)
+        self.medians = medians
+
+        carry = None  # (last patient ID, its last WINDOW-1 imputed rows as a float block)
+        for chunk in self._read_chunks(chunksize, schema):
+            yield chunk, carry
+            ids = chunk['Patient_ID'].to_numpy()
+            last = np.flatnonzero(patient_starts(ids))[-1]
+            block, _ = self._impute_chunk(chunk.iloc[last:], carry)
+            carry = ids[-1], block[:, -(WINDOW - 1):].copy()
+
+    def process_chunk(self, chunk, carry):
+        """Feature pipeline of one raw chunk from stream_chunks() (uses self.medians)."""
+        block, seg_start = self._impute_chunk(chunk, carry)
+        k = block.shape[1] - len(chunk)
+        rows = np.arange(block.shape[1])
+        starts = seg_start == rows
+
+        # 2. Feature Engineering over carried + new rows, then drop the carried rows
+        float_cols = [c for c in chunk.columns if chunk[c].dtype == np.float32]
+        df = pd.DataFrame(block.T, columns=float_cols, copy=False)
+        df = self._add_temporal_features(df, starts, dtype=np.float32, verbose=False)
+        if k:
+            df = df.iloc[k:]
+        df.index = chunk.index
+
+        # Other columns keep their narrowed dtype and position; Patient_ID goes last
+        base_cols = [c for c in chunk.columns if c != 'Patient_ID']
+        for loc, col in enumerate(base_cols):
+            if col not in float_cols:
+                df.insert(loc, col, chunk[col].to_numpy())
+        df.insert(len(base_cols), 'Patient_ID', chunk['Patient_ID'])
+        return df
+
+    def _impute_chunk(self, chunk, carry):
+        """
+        Step 1 of process_chunk: the carried rows (if the patient continues) followed by
+        the chunk's float columns, forward filled per patient with self.medians for
+        the gaps. Returns (float block (columns x rows), segment start of each row).
+        """
+        float_cols = [c for c in chunk.columns if chunk[c].dtype == np.float32]
+        fill = [self.medians.get(c, np.nan) for c in float_cols]
+        ids = chunk['Patient_ID'].to_numpy()
+        k = carry[1].shape[1] if carry is not None and ids[0] == carry[0] else 0
+        ext_ids = np.concatenate([np.repeat(ids[:1], k), ids])
+        rows = np.arange(len(ext_ids))
+        seg_start = np.maximum.accumulate(np.where(patient_starts(ext_ids), rows, 0))
+
+        # 1. Imputation (carried rows are already filled, so ffill continues from them)
+        block = np.empty((len(float_cols), len(ext_ids)), dtype=np.float32)
+        if k:
+            block[:, :k] = carry[1]
+        for i, col in enumerate(float_cols):
+            block[i, k:] = chunk[col].to_numpy()
+            values, leak = _ffill_segments(block[i], rows, seg_start)
+            values[leak] = fill[i]
+            block[i] = values
+        return block, seg_start
+
+    def _add_temporal_features(self, df, starts, dtype=np.float64, verbose=True):
+        """Lags, Deltas and Rolling means via the shared engine (features.py) in bulk mode."""
+        if verbose:
+            print("Engineering Time-Series Features (Lags, Deltas, Rolling)...")
         
-        # Key Vitals to engineer
-        vitals = ['HR', 'MAP', 'SBP', 'O2Sat', 'Temp', 'Resp']
         # Check if MAP exists, else calculate (approx) or skip
         if 'MAP' not in df.columns and 'SBP' in df.columns and 'DBP' in df.columns:
              df['MAP'] = (df['SBP'] + 2*df['DBP']) / 3
         
-        existing_vitals = [v for v in vitals if v in df.columns]
+        existing_vitals = [v for v in VITALS if v in df.columns]
 
+        # First row of a patient: Lag_1 = Current (Delta = 0) as in the Cold Start plan
+        # One vital at a time keeps the temporaries to a few columns
+        pos = segment_positions(starts)
         for col in existing_vitals:
-            # Shift 1 (Previous Hour)
-            df[f'{col}_Lag1'] = df.groupby('Patient_ID')[col].shift(1)
-            
-            # Delta (Current - Prev)
-            df[f'{col}_Delta'] = df[col] - df[f'{col}_Lag1']
-            
-            # Rolling Mean (past 6 hours)
-            # Optimized: groupby().rolling() returns MultiIndex, we reset level 0 to match df index
-            rolled = df.groupby('Patient_ID')[col].rolling(window=6, min_periods=1).mean()
-            df[f'{col}_RollMean6h'] = rolled.reset_index(level=0, drop=True)
-
-        # Handle NaNs generated by Lagging (first row of patient)
-        # We assume Lag_1 = Current for the first row (Delta = 0) as discussed in the Cold Start plan
-        for col in existing_vitals:
-            df[f'{col}_Lag1'] = df[f'{col}_Lag1'].fillna(df[col])
-            df[f'{col}_Delta'] = df[f'{col}_Delta'].fillna(0)
-            df[f'{col}_RollMean6h'] = df[f'{col}_RollMean6h'].fillna(df[col])
-
-        self.processed_df = df
-        print(f"Preprocessing complete. Features: {df.shape[1]}")
-        return self.processed_df
+            lag1, delta, roll_mean = engineer_column(df[col].to_numpy(dtype=np.float64), pos)
+            df[f'{col}_Lag1'] = lag1.astype(dtype, copy=False)
+            df[f'{col}_Delta'] = delta.astype(dtype, copy=False)
+            df[f'{col}_RollMean6h'] = roll_mean.astype(dtype, copy=False)
+        return df
 
     def split_data(self, test_size=0.2, val_size=0.1):
         """Splits data by Patient_ID to avoid leakage."""
@@ -116,6 +441,62 @@ class DataLoader:
         
         return X_train, y_train, X_val, y_val, X_test, y_test
 
+    def split_indices(self, test_size=0.2, val_size=0.1):
+        """Positional (train_idx, val_idx, test_idx), the same partitions as split_data()."""
+        folds, test_idx = self.split_folds(1, test_size, val_size)
+        (train_idx, val_idx), = folds
+        return train_idx, val_idx, test_idx
+
+    def split_folds(self, n_folds=3, test_size=0.2, val_size=0.1):
+        """
+        Patient-grouped CV folds for tuning: the test patients of split_indices() are
+        held out, and Train+Val is re-split n_folds times with the same GroupShuffleSplit.
+        Fold 0 is the split_indices() train/val split.
+        Returns (list of positional (train_idx, val_idx) pairs, test_idx).
+        """
+        groups = self.processed_df['Patient_ID'].to_numpy()
+
+        # Split 1: Train+Val vs Test (only the groups matter to GroupShuffleSplit)
+        splitter_test = GroupShuffleSplit(test_size=test_size, n_splits=1, random_state=42)
+        train_val_idx, test_idx = next(splitter_test.split(groups, groups=groups))
+
+        # Split 2: Train vs Val (from Train+Val); the first split does not depend on n_folds
+        relative_val_size = val_size / (1 - test_size)
+        splitter_val = GroupShuffleSplit(test_size=relative_val_size, n_splits=n_folds, random_state=42)
+        train_groups = groups[train_val_idx]
+        folds = [(train_val_idx[train_idx], train_val_idx[val_idx])
+                 for train_idx, val_idx in splitter_val.split(train_groups, groups=train_groups)]
+        return folds, test_idx
+
+    def split_views(self, test_size=0.2, val_size=0.1, mmap_path=None):
+        """
+        Zero-copy alternative to split_data(): one float32 feature matrix, written
+        once in partition order, with train/val/test as views (see FeatureSplits).
+        mmap_path: write the matrix to this .npy file (memory-mapped) instead of RAM.
+        """
+        print("Splitting data (Train/Val/Test) by Patient_ID into shared views...")
+        train_idx, val_idx, test_idx = self.split_indices(test_size, val_size)
+        order = np.concatenate([train_idx, val_idx, test_idx])
+
+        df = self.processed_df
+        feature_names = [c for c in df.columns if c not in ('SepsisLabel', 'Patient_ID')]
+        shape = (len(order), len(feature_names))
+        if mmap_path:
+            X = np.lib.format.open_memmap(mmap_path, mode='w+', dtype=np.float32, shape=shape)
+        else:
+            X = np.empty(shape, dtype=np.float32)
+        # Column by column, so the only full-size allocation is X itself
+        for j, col in enumerate(feature_names):
+            X[:, j] = df[col].to_numpy()[order]
+        if mmap_path:
+            X.flush()
+        y = df['SepsisLabel'].to_numpy()[order]
+
+        splits = FeatureSplits(X, y, feature_names, train_idx, val_idx, test_idx)
+        for name in ('train', 'val', 'test'):
+            print(f"{name.capitalize() + ':':<6} {len(splits.part(name)[0])} rows")
+        return splits
+
 if __name__ == "__main__":
     # Test the loader
     loader = DataLoader(r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\Dataset.csv')
@@ -8,11 +8,10 @@ sys.path.append(os.path.dirname(__file__))
 
 from inference import SepsisPredictor
 from clinical_rules import apply_clinical_rules
+from thresholds import risk_label
 
 def get_risk_label(prob):
-    if prob >= 0.22: return "CRITICAL"
-    if prob >= 0.08: return "WARNING"
-    return "STABLE"
+    return risk_label(prob)
 
 def main():
     parser = argparse.ArgumentParser(description="Clinivora Sepsis Diagnosis Tool")
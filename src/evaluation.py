@@ -0,0 +1,302 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.dirname(__file__))
+
+from features import patient_starts
+from thresholds import THRESHOLDS
+
+# --- CONFIGURATION ---
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'sepsis_xgboost.pkl')
+DATA_PATH = r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\Dataset.csv'
+
+def ranking_scores(n_scores, pos_ranks, pos_inverse, pos_weights, neg_index, neg_weights):
+    """
+    Weighted row-level AUC-ROC and average precision from scores pre-ranked into
+    n_scores distinct values (ascending). Positives are given as their distinct
+    ranks (pos_ranks) and each positive row's position in it (pos_inverse);
+    neg_index is the rank of each negative row. Only ranks holding positives move
+    either metric, so the per-rank work is over those. Ties count half for AUC
+    and are one threshold for AP (as in sklearn).
+    """
+    pos = np.bincount(pos_inverse, pos_weights, minlength=len(pos_ranks))
+    neg = np.bincount(neg_index, neg_weights, minlength=n_scores)
+    total_pos, total_neg = pos.sum(), neg.sum()
+    if total_pos == 0 or total_neg == 0:
+        return np.nan, np.nan
+    neg_tied = neg[pos_ranks]
+    neg_at_or_below = np.cumsum(neg)[pos_ranks]
+
+    # AUC: each positive beats the negatives ranked below it, ties count half
+    auc = float(np.sum(pos * (neg_at_or_below - 0.5 * neg_tied)) / (total_pos * total_neg))
+
+    # AP: precision at each threshold that adds recall, from the highest score down
+    tp = np.cumsum(pos[::-1])[::-1]
+    fp = total_neg - neg_at_or_below + neg_tied
+    precision = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=tp + fp > 0)
+    ap = float(np.sum(pos / total_pos * precision))
+    return auc, ap
+
+def weighted_median(sorted_values, weights):
+    """Lower median of sorted_values with integer weights (bootstrap counts); NaN if empty."""
+    cum = np.cumsum(weights)
+    if len(cum) == 0 or cum[-1] == 0:
+        return np.nan
+    return float(sorted_values[np.searchsorted(cum, cum[-1] / 2.0)])
+
+class CohortEvaluation:
+    """
+    Cohort metrics from one scoring pass: row-level AUC/AUPRC plus, per alert
+    threshold, patient-level detection, first-alert lead time before onset and
+    alert burden. All per-patient quantities come from segmented reductions over
+    the Patient_ID boundaries, so resampling patients (bootstrap) only reweights them.
+
+    Onset is the first hour with SepsisLabel = 1 (in the PhysioNet 2019 labels
+    that is 6 hours before clinical onset). Lead time = onset - first alert hour,
+    positive when the alert came first.
+    """
+    def __init__(self, probs, labels, patient_ids, hours, thresholds=THRESHOLDS):
+        # Rows sorted by patient and hour (stable: keeps the input order otherwise)
+        patient_ids = np.asarray(patient_ids)
+        hours = np.asarray(hours, dtype=np.float64)
+        order = np.lexsort((hours, patient_ids))
+        self.probs = np.asarray(probs, dtype=np.float64)[order]
+        self.labels = np.asarray(labels, dtype=np.int8)[order]
+        self.hours = hours[order]
+        patient_ids = patient_ids[order]
+        self.thresholds = dict(thresholds)
+
+        starts = patient_starts(patient_ids)
+        self.seg_starts = np.flatnonzero(starts)
+        self.patient_of_row = np.cumsum(starts) - 1
+        self.n_patients = len(self.seg_starts)
+        self.rows_per_patient = np.diff(np.r_[self.seg_starts, len(self.probs)])
+        self.septic = np.maximum.reduceat(self.labels, self.seg_starts) > 0 if len(self.probs) else np.zeros(0, bool)
+        self.onset = self._first_hour(self.labels == 1)
+
+        # Scores ranked once for every (bootstrap) AUC/AP, split by label
+        unique, score_index = np.unique(self.probs, return_inverse=True)
+        self.n_scores = len(unique)
+        positive = self.labels == 1
+        self.pos_ranks, self.pos_inverse = np.unique(score_index[positive], return_inverse=True)
+        self.pos_patient = self.patient_of_row[positive]
+        self.neg_index, self.neg_patient = score_index[~positive], self.patient_of_row[~positive]
+
+        self.levels = {name: self._level_table(t) for name, t in self.thresholds.items()}
+
+    def _first_hour(self, mask):
+        """Per patient: hour of the first row where mask holds (inf if never)."""
+        if len(mask) == 0:
+            return np.zeros(0)
+        return np.minimum.reduceat(np.where(mask, self.hours, np.inf), self.seg_starts)
+
+    def _level_table(self, threshold):
+        """Per-patient alert quantities at one threshold."""
+        alert = self.probs >= threshold
+        # Alert episodes: rows where an alert starts (not alerting in the patient's previous hour)
+        rising = alert.copy()
+        rising[1:] &= ~alert[:-1]
+        rising[self.seg_starts] = alert[self.seg_starts]
+
+        first_alert = self._first_hour(alert)
+        alerted = np.isfinite(first_alert)
+        detected = self.septic & alerted
+        with np.errstate(invalid='ignore'):
+            lead = np.where(detected, self.onset - first_alert, np.nan)
+        lead_order = np.flatnonzero(detected)[np.argsort(lead[detected], kind='stable')]
+        return {
+            'threshold': threshold,
+            'alerted': alerted,
+            'detected': detected,
+            'lead': lead,
+            'lead_order': lead_order,  # detected patients sorted by lead time
+            'alert_rows': np.add.reduceat(alert.astype(np.int64), self.seg_starts) if len(alert) else np.zeros(0),
+            'episodes': np.add.reduceat(rising.astype(np.int64), self.seg_starts) if len(alert) else np.zeros(0)
+        }
+
+    def metrics(self, weights=None):
+        """
+        All metrics with patient weights (bootstrap counts; None = every patient once).
+        """
+        w = np.ones(self.n_patients) if weights is None else np.asarray(weights, dtype=np.float64)
+        auc, auprc = ranking_scores(self.n_scores, self.pos_ranks, self.pos_inverse, w[self.pos_patient],
+                                    self.neg_index, w[self.neg_patient])
+
+        n_septic = np.sum(w * self.septic)
+        n_other = np.sum(w * ~self.septic)
+        patient_days = np.sum(w * self.rows_per_patient) / 24.0
+        out = {
+            'patients': float(w.sum()),
+            'septic_patients': float(n_septic),
+            'auc': auc,
+            'auprc': auprc
+        }
+        for name, t in self.levels.items():
+            detected = np.sum(w * t['detected'])
+            alerted = np.sum(w * t['alerted'])
+            early = np.sum(w * (t['detected'] & (t['lead'] >= 0)))
+            out[name] = {
+                'threshold': t['threshold'],
+                # Septic patients with an alert at any time / before (or at) onset
+                'sensitivity': detected / n_septic if n_septic else np.nan,
+                'sensitivity_before_onset': early / n_septic if n_septic else np.nan,
+                'median_lead_hours': weighted_median(t['lead'][t['lead_order']], w[t['lead_order']]),
+                # Non-septic patients alerted at least once
+                'false_alarm_rate': np.sum(w * (t['alerted'] & ~self.septic)) / n_other if n_other else np.nan,
+                'patient_ppv': detected / alerted if alerted else np.nan,
+                # Alert burden per patient-day on the ward
+                'alert_hours_per_patient_day': np.sum(w * t['alert_rows']) / patient_days if patient_days else np.nan,
+                'alert_episodes_per_patient_day': np.sum(w * t['episodes']) / patient_days if patient_days else np.nan
+            }
+        return out
+
+    def bootstrap(self, n_boot=1000, workers=None, seed=42, alpha=0.05):
+        """
+        Patient-level bootstrap: (1 - alpha) percentile intervals of every metric,
+        replicates split across processes.
+        """
+        workers = max(1, min(workers or os.cpu_count(), n_boot))
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        sizes = [len(part) for part in np.array_split(np.arange(n_boot), workers)]
+
+        if workers == 1:
+            replicates = _bootstrap_part(self, sizes[0], seeds[0])
+        else:
+            ctx = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+            with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(self,)) as pool:
+                replicates = []
+                for part in pool.map(_bootstrap_worker, sizes, seeds):
+                    replicates.extend(part)
+        return _intervals(replicates, alpha)
+
+    def report(self, n_boot=1000, workers=None, seed=42, alpha=0.05):
+        report = {'metrics': _to_json(self.metrics())}
+        if n_boot:
+            start = time.perf_counter()
+            report['ci'] = self.bootstrap(n_boot, workers, seed, alpha)
+            report['bootstrap'] = {'replicates': n_boot, 'alpha': alpha,
+                                   'seconds': time.perf_counter() - start}
+        return report
+
+# --- Bootstrap workers ---
+_evaluation = None
+
+def _init_worker(evaluation):
+    global _evaluation
+    _evaluation = evaluation
+
+def _bootstrap_worker(n, seed):
+    return _bootstrap_part(_evaluation, n, seed)
+
+def _bootstrap_part(evaluation, n, seed):
+    rng = np.random.default_rng(seed)
+    replicates = []
+    for _ in range(n):
+        picks = rng.integers(0, evaluation.n_patients, evaluation.n_patients)
+        weights = np.bincount(picks, minlength=evaluation.n_patients)
+        replicates.append(evaluation.metrics(weights))
+    return replicates
+
+def _flatten(metrics, prefix=''):
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+def _intervals(replicates, alpha):
+    """{metric: [low, high]} percentile intervals (nested like metrics())."""
+    flat = [_flatten(r) for r in replicates]
+    out = {}
+    for key in flat[0]:
+        if key.endswith(('threshold', 'patients')):
+            continue
+        values = np.array([f[key] for f in flat], dtype=np.float64)
+        values = values[~np.isnan(values)]
+        bounds = np.percentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)]).tolist() if len(values) else [None, None]
+        node = out
+        *path, leaf = key.split('.')
+        for part in path:
+            node = node.setdefault(part, {})
+        node[leaf] = bounds
+    return out
+
+def _to_json(value):
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    value = float(value)
+    return None if np.isnan(value) else value
+
+def print_report(report):
+    m, ci = report['metrics'], report.get('ci', {})
+
+    def fmt(value, bounds=None, digits=3):
+        if value is None:
+            return "n/a"
+        text = f"{value:.{digits}f}"
+        if bounds and bounds[0] is not None:
+            text += f" [{bounds[0]:.{digits}f}, {bounds[1]:.{digits}f}]"
+        return text
+
+    print(f"Patients: {int(m['patients'])} ({int(m['septic_patients'])} septic)")
+    print(f"AUC-ROC: {fmt(m['auc'], ci.get('auc'), 4)}")
+    print(f"AUPRC:   {fmt(m['auprc'], ci.get('auprc'), 4)}")
+    for level, t in m.items():
+        if not isinstance(t, dict):
+            continue
+        lci = ci.get(level, {})
+        print(f"\n{level.upper()} (prob >= {t['threshold']:.4f})")
+        print(f"  Sensitivity (patients):       {fmt(t['sensitivity'], lci.get('sensitivity'))}")
+        print(f"  Alerted by onset:             {fmt(t['sensitivity_before_onset'], lci.get('sensitivity_before_onset'))}")
+        print(f"  Median lead time (hours):     {fmt(t['median_lead_hours'], lci.get('median_lead_hours'), 1)}")
+        print(f"  False alarm rate (patients):  {fmt(t['false_alarm_rate'], lci.get('false_alarm_rate'))}")
+        print(f"  Patient PPV:                  {fmt(t['patient_ppv'], lci.get('patient_ppv'))}")
+        print(f"  Alert hours / patient-day:    {fmt(t['alert_hours_per_patient_day'], lci.get('alert_hours_per_patient_day'), 2)}")
+        print(f"  Alert episodes / patient-day: {fmt(t['alert_episodes_per_patient_day'], lci.get('alert_episodes_per_patient_day'), 2)}")
+
+if __name__ == "__main__":
+    from data_loader import DataLoader
+    from inference import SepsisPredictor
+
+    parser = argparse.ArgumentParser(description="Cohort evaluation: lead times, alert burden, bootstrap CIs")
+    parser.add_argument("--data", default=DATA_PATH, help="Cohort CSV (preprocessed through the feature cache)")
+    parser.add_argument("--cache-dir", default=None, help="Feature cache directory")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model file (.pkl or exported .npz)")
+    parser.add_argument("--all-rows", action="store_true", help="Evaluate every patient, not just the test split")
+    parser.add_argument("--boot", type=int, default=1000, help="Bootstrap replicates (0 = no CIs)")
+    parser.add_argument("--workers", type=int, default=None, help="Bootstrap processes (default: all cores)")
+    parser.add_argument("--output", default="evaluation.json", help="JSON report file")
+    args = parser.parse_args()
+
+    loader = DataLoader(args.data)
+    df = loader.load_processed(args.cache_dir)
+    if not args.all_rows:
+        _, _, test_idx = loader.split_indices()
+        df = df.iloc[np.sort(test_idx)]
+
+    predictor = SepsisPredictor(args.model)
+    start = time.perf_counter()
+    X = df.reindex(columns=predictor.feature_names).to_numpy(dtype=np.float32)
+    probs = predictor.score(X)
+    print(f"Scored {len(X):,} rows in {time.perf_counter() - start:.2f}s")
+
+    evaluation = CohortEvaluation(probs, df['SepsisLabel'].to_numpy(), df['Patient_ID'].to_numpy(),
+                                  df['Hour'].to_numpy())
+    report = evaluation.report(args.boot, args.workers)
+    print_report(report)
+    if 'bootstrap' in report:
+        print(f"\nBootstrap: {args.boot} replicates in {report['bootstrap']['seconds']:.1f}s")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[SUCCESS] Evaluation report saved to '{args.output}'")
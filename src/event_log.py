@@ -0,0 +1,265 @@
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from features import VITALS, WINDOW, vitals_vector
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL_MS = 50
+DEFAULT_COMPACT_INTERVAL_S = 600
+MAX_PENDING = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,      -- arrival order
+    patient_id TEXT NOT NULL,
+    ts REAL NOT NULL,             -- reading time (epoch seconds)
+    hour INTEGER NOT NULL,        -- hour bucket of ts, as in PatientHistoryStore
+    received REAL NOT NULL,       -- arrival time (epoch seconds)
+    vitals TEXT NOT NULL          -- JSON {vital: value} of the known vitals
+);
+CREATE INDEX IF NOT EXISTS events_patient ON events (patient_id, hour);
+
+-- Events from before a patient's feature window, folded into the last known value
+-- of each vital (the forward-fill source of the window's first hour)
+CREATE TABLE IF NOT EXISTS snapshots (
+    patient_id TEXT PRIMARY KEY,
+    hour INTEGER NOT NULL,
+    received REAL NOT NULL,
+    vitals TEXT NOT NULL
+);
+"""
+
+def _encode(current):
+    return json.dumps({v: x for v, x in zip(VITALS, current) if x == x})
+
+def _fold(last, current):
+    """Last known value per vital: newer readings win, missing ones keep the old value."""
+    return [c if c == c else l for c, l in zip(current, last)]
+
+class EventLog:
+    """
+    Durable append-only log of patient vitals events in SQLite (WAL mode), so a
+    restarted API can rebuild its PatientHistoryStore.
+
+    append() only queues the event; a background thread writes the queue in one
+    transaction every flush_interval_ms (one fsync per batch, synchronous=FULL),
+    so at most that much is lost on a crash. Every compact_interval_s, the events
+    from before each patient's feature window are folded into one snapshot row
+    and deleted, and patients not seen for ttl_seconds are dropped. replay() then
+    restores the same ring buffer: the window's hours come from the kept events,
+    the forward-fill values before them from the snapshot.
+    """
+    def __init__(self, path, ttl_seconds=12 * 3600, flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 compact_interval_s=DEFAULT_COMPACT_INTERVAL_S):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.compact_interval = compact_interval_s
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+
+        self._pending = deque()  # ('event', row) / ('discharge', patient_id), in arrival order
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_compaction = None
+        self._next_compaction = time.time() + self.compact_interval
+        self._thread = threading.Thread(target=self._run, name="sepsis-event-log", daemon=True)
+        self._thread.start()
+
+    def append(self, patient_id, current_data, timestamp, received=None):
+        """Queues one vitals event (current_data: the request's input dict)."""
+        self.append_vitals(patient_id, vitals_vector(current_data), timestamp, received)
+
+    def append_vitals(self, patient_id, current, timestamp, received=None):
+        """append() for a vitals list aligned with VITALS."""
+        timestamp = float(timestamp)
+        row = (str(patient_id), timestamp, int(timestamp // 3600), received or time.time(),
+               _encode(current))
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING:
+                # Disk stalled: drop the oldest rather than grow without bound
+                self._pending.popleft()
+                self.dropped += 1
+                ERRORS.inc('event_log_dropped')
+            self._pending.append(('event', row))
+            self.appended += 1
+
+    def discharge(self, patient_id):
+        with self._lock:
+            self._pending.append(('discharge', str(patient_id)))
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if time.time() >= self._next_compaction:
+                self.compact()
+
+    def flush(self):
+        """Writes the queued events in one transaction. Returns the number of events written."""
+        with self._lock:
+            batch, self._pending = self._pending, deque()
+        if not batch:
+            return 0
+        try:
+            with self._db_lock:
+                self._db.execute("BEGIN")
+                rows = []
+                for kind, item in batch:
+                    if kind == 'event':
+                        rows.append(item)
+                        continue
+                    self._insert(rows)
+                    rows = []
+                    self._db.execute("DELETE FROM events WHERE patient_id = ?", (item,))
+                    self._db.execute("DELETE FROM snapshots WHERE patient_id = ?", (item,))
+                self._insert(rows)
+                self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            ERRORS.inc('event_log')
+            logger.error("Event log write failed (will retry): events=%d error=%s", len(batch), e)
+            with self._db_lock:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+            with self._lock:
+                self._pending.extendleft(reversed(batch))
+            return 0
+        n_events = sum(1 for kind, _ in batch if kind == 'event')
+        self.written += n_events
+        self.flushes += 1
+        return n_events
+
+    def _insert(self, rows):
+        if rows:
+            self._db.executemany(
+                "INSERT INTO events (patient_id, ts, hour, received, vitals) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def compact(self, now=None):
+        """
+        Folds each patient's events from before their feature window (the events
+        that arrived before the first one of the last WINDOW hours) into their
+        snapshot, deletes them, and drops patients idle for ttl_seconds.
+        Returns the number of events compacted.
+        """
+        now = time.time() if now is None else now
+        stale = now - self.ttl_seconds
+        self._next_compaction = now + self.compact_interval
+        try:
+            with self._db_lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                # Idle patients (same TTL as PatientHistoryStore)
+                self._db.execute(
+                    "DELETE FROM events WHERE patient_id IN "
+                    "(SELECT patient_id FROM events GROUP BY patient_id HAVING MAX(received) < ?)",
+                    (stale,)
+                )
+                self._db.execute(
+                    "DELETE FROM snapshots WHERE patient_id NOT IN (SELECT patient_id FROM events)"
+                )
+                rows = self._db.execute(
+                    "SELECT e.seq, e.patient_id, e.hour, e.received, e.vitals FROM events e "
+                    "JOIN (SELECT w.patient_id, MIN(w.seq) AS first_seq FROM events w "
+                    "      JOIN (SELECT patient_id, MAX(hour) AS last_hour FROM events GROUP BY patient_id) l "
+                    "      ON w.patient_id = l.patient_id AND w.hour > l.last_hour - ? "
+                    "      GROUP BY w.patient_id) k "
+                    "ON e.patient_id = k.patient_id AND e.seq < k.first_seq ORDER BY e.seq",
+                    (WINDOW,)
+                ).fetchall()
+                snapshots = {}
+                for _, pid, hour, received, vitals in rows:
+                    snap = snapshots.get(pid)
+                    if snap is None:
+                        old = self._db.execute(
+                            "SELECT hour, received, vitals FROM snapshots WHERE patient_id = ?", (pid,)
+                        ).fetchone()
+                        snap = [old[0], old[1], vitals_vector(json.loads(old[2]))] if old else \
+                            [hour, received, [math.nan] * len(VITALS)]
+                        snapshots[pid] = snap
+                    snap[1] = max(snap[1], received)
+                    if hour < snap[0]:
+                        continue  # late reading: PatientHistory does not record it either
+                    snap[0] = hour
+                    snap[2] = _fold(snap[2], vitals_vector(json.loads(vitals)))
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO snapshots (patient_id, hour, received, vitals) VALUES (?, ?, ?, ?)",
+                    [(pid, hour, received, _encode(vitals)) for pid, (hour, received, vitals) in snapshots.items()]
+                )
+                self._db.executemany("DELETE FROM events WHERE seq = ?", [(row[0],) for row in rows])
+                self._db.execute("COMMIT")
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            with self._db_lock:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+            ERRORS.inc('event_log')
+            logger.error("Event log compaction failed: error=%s", e)
+            return 0
+        self.last_compaction = now
+        if rows:
+            logger.info("Event log compacted: events=%d patients=%d", len(rows), len(snapshots))
+        return len(rows)
+
+    def replay(self, store, now=None):
+        """
+        Rebuilds the histories of the patients seen within ttl_seconds into a
+        PatientHistoryStore, in one pass over the log. Returns the number of patients.
+        """
+        now = time.time() if now is None else now
+        self.flush()
+        stale = now - self.ttl_seconds
+        patients = {}  # patient_id -> [last_seen, [(hour, vitals), ...]]
+        with self._db_lock:
+            for pid, hour, received, vitals in self._db.execute(
+                    "SELECT patient_id, hour, received, vitals FROM snapshots"):
+                patients[pid] = [received, [(hour, vitals_vector(json.loads(vitals)))]]
+            for pid, hour, received, vitals in self._db.execute(
+                    "SELECT patient_id, hour, received, vitals FROM events ORDER BY seq"):
+                entry = patients.setdefault(pid, [0.0, []])
+                entry[0] = max(entry[0], received)
+                entry[1].append((hour, vitals_vector(json.loads(vitals))))
+
+        active = {pid: entry for pid, entry in patients.items() if entry[0] >= stale}
+        store.restore(active)
+        return len(active)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "path": self.path,
+            "appended": self.appended,
+            "written": self.written,
+            "pending": pending,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_compaction": self.last_compaction
+        }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import features
+
+# Bump when preprocess() output changes in a way features.py does not show
+# (imputation, column order, ...). Edits to features.py invalidate the cache on their own.
+FEATURE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '.feature_cache')
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of the file content."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def feature_version():
+    """FEATURE_VERSION plus a hash of the feature definitions (features.py source)."""
+    with open(features.__file__, 'rb') as f:
+        source_hash = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"{FEATURE_VERSION}-{source_hash}"
+
+class FeatureCache:
+    """
+    On-disk cache of DataLoader.preprocess() output, keyed by the input file's
+    content hash and the feature version. Float columns are stored as one
+    column-major float .npy block and loaded memory-mapped, so a hit costs a
+    hash of the input file plus opening the files, not a re-run of preprocess.
+
+    Layout: <cache_dir>/<key>/{meta.json, float_block.npy, col_<i>.npy, index.npy}
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def key(self, filepath):
+        digest = hashlib.sha256(f"{file_hash(filepath)}:{feature_version()}".encode())
+        return digest.hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, mmap=True):
+        """Returns the cached frame, or None on a miss."""
+        entry = self.path(key)
+        meta_path = os.path.join(entry, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        block = np.load(os.path.join(entry, 'float_block.npy'), mmap_mode=mmap_mode)
+        index = np.load(os.path.join(entry, 'index.npy'))
+        df = pd.DataFrame(block.T, columns=meta['float_columns'], index=index, copy=False)
+        for i, (col, loc, dtype) in enumerate(meta['other_columns']):
+            values = np.load(os.path.join(entry, f'col_{i}.npy'), allow_pickle=dtype == 'object')
+            df.insert(loc, col, values)
+        return df
+
+    def save(self, key, df, source=None):
+        """Writes the frame atomically (temp dir + rename)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            float_cols = [c for c in df.columns if df[c].dtype.kind == 'f']
+            dtype = np.result_type(*[df[c].dtype for c in float_cols]) if float_cols else np.float64
+            # Column-major: row i of the block is column i of the frame
+            block = np.lib.format.open_memmap(
+                os.path.join(tmp, 'float_block.npy'), mode='w+',
+                dtype=dtype, shape=(len(float_cols), len(df))
+            )
+            for i, col in enumerate(float_cols):
+                block[i] = df[col].to_numpy()
+            block.flush()
+            del block
+
+            other = []
+            for loc, col in enumerate(df.columns):
+                if col in float_cols:
+                    continue
+                values = df[col].to_numpy()
+                if values.dtype.kind not in 'biuf':
+                    values = values.astype(object)
+                np.save(os.path.join(tmp, f'col_{len(other)}.npy'), values, allow_pickle=True)
+                other.append((col, loc, values.dtype.str if values.dtype.kind != 'O' else 'object'))
+            np.save(os.path.join(tmp, 'index.npy'), df.index.to_numpy())
+
+            meta = {
+                'feature_version': feature_version(),
+                'source': source,
+                'rows': len(df),
+                'float_columns': float_cols,
+                'other_columns': other,
+                'created': time.time()
+            }
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=2)
+
+            entry = self.path(key)
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.replace(tmp, entry)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return self.path(key)
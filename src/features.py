@@ -0,0 +1,199 @@
+import math
+import numpy as np
+
+# Key vitals with engineered Lag1/Delta/RollMean6h features (training and inference)
+VITALS = ['HR', 'MAP', 'SBP', 'O2Sat', 'Temp', 'Resp']
+
+# Rolling window in hours, including the current hour
+WINDOW = 6
+
+def temporal_columns(vitals=VITALS):
+    """Engineered column names, in the order DataLoader.preprocess adds them."""
+    cols = []
+    for v in vitals:
+        cols += [f'{v}_Lag1', f'{v}_Delta', f'{v}_RollMean6h']
+    return cols
+
+def patient_starts(patient_ids):
+    """Boolean mask of the first row of each patient (rows sorted by patient)."""
+    patient_ids = np.asarray(patient_ids)
+    starts = np.empty(len(patient_ids), dtype=bool)
+    if len(patient_ids):
+        starts[0] = True
+        starts[1:] = patient_ids[1:] != patient_ids[:-1]
+    return starts
+
+def segment_positions(starts):
+    """Position of each row within its patient (0 = first hour)."""
+    rows = np.arange(len(starts))
+    return rows - np.maximum.accumulate(np.where(starts, rows, 0))
+
+def engineer_column(values, pos):
+    """
+    Bulk mode for one vital: Lag1, Delta and RollMean6h for every row at once.
+
+    values: 1-D float array sorted by patient and time
+    pos: segment_positions() of the rows
+    Returns: (lag1, delta, roll_mean) arrays
+
+    Same rules as RollingState:
+    Lag1 = previous hour (Current if none), Delta = Current - previous (0 if none,
+    NaN if Current is missing),
+    RollMean6h = mean of the non-missing values of the last 6 hours (Current if none).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+
+    prev = np.empty(n)
+    prev[0:1] = np.nan
+    prev[1:] = values[:-1]
+    prev[pos == 0] = np.nan
+
+    # Cold start: no previous reading -> Delta 0; a missing Current stays NaN
+    delta = values - prev
+    delta[np.isnan(prev) & ~np.isnan(values)] = 0.0
+    lag1 = np.where(np.isnan(prev), values, prev)
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    sums = filled.copy()
+    counts = valid.astype(np.int8)
+    for k in range(1, min(WINDOW, n)):
+        in_window = pos[k:] >= k
+        sums[k:] += np.where(in_window, filled[:-k], 0.0)
+        counts[k:] += in_window & valid[:-k]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        roll_mean = np.where(counts > 0, sums / counts, values)
+
+    return lag1, delta, roll_mean
+
+def engineer_bulk(values, starts):
+    """
+    Bulk mode over several vitals.
+
+    values: (n_rows, n_vitals) array sorted by patient and time
+    starts: boolean mask of the first row of each patient
+    Returns: (lag1, delta, roll_mean) arrays shaped like values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    pos = segment_positions(starts)
+    out = [np.empty_like(values) for _ in range(3)]
+    for j in range(values.shape[1]):
+        for arr, col in zip(out, engineer_column(values[:, j], pos)):
+            arr[:, j] = col
+    return tuple(out)
+
+class RollingState:
+    """
+    Per-event mode: streaming Lag1/Delta/RollMean6h state of one patient.
+    A ring buffer of the last WINDOW hours with a running sum/count per vital,
+    so each hourly update is O(1). Missing vitals are forward filled.
+    """
+    __slots__ = ('buf', 'head', 'sums', 'counts', 'n_hours')
+
+    def __init__(self):
+        self.buf = [[math.nan] * len(VITALS) for _ in range(WINDOW)]
+        self.head = -1        # slot of the current hour
+        self.sums = [0.0] * len(VITALS)
+        self.counts = [0] * len(VITALS)
+        self.n_hours = 0
+
+    def _write(self, slot, values):
+        old = self.buf[slot]
+        for j, val in enumerate(values):
+            if old[j] == old[j]:  # not NaN
+                self.sums[j] -= old[j]
+                self.counts[j] -= 1
+            if val == val:
+                self.sums[j] += val
+                self.counts[j] += 1
+        self.buf[slot] = values
+
+    def _ffill(self, current, last):
+        return [c if c == c else l for c, l in zip(current, last)]
+
+    def push(self, current):
+        """Starts a new hour with the given vitals (list aligned with VITALS)."""
+        if self.n_hours:
+            current = self._ffill(current, self.buf[self.head])
+        self.head = (self.head + 1) % WINDOW
+        self._write(self.head, current)
+        self.n_hours += 1
+        if self.head == 0:
+            # Resync once per lap so the running sums never drift
+            for j in range(len(VITALS)):
+                vals = [row[j] for row in self.buf if row[j] == row[j]]
+                self.sums[j] = math.fsum(vals)
+                self.counts[j] = len(vals)
+
+    def replace(self, current):
+        """Overwrites the current hour (a newer reading within the same hour)."""
+        if not self.n_hours:
+            return self.push(current)
+        self._write(self.head, self._ffill(current, self.buf[self.head]))
+
+    def carry_forward(self, hours):
+        """Hours without readings repeat the last values (bounded by the window)."""
+        for _ in range(min(hours, WINDOW)):
+            self.push(list(self.buf[self.head]))
+
+    def current(self):
+        return self.buf[self.head] if self.n_hours else [math.nan] * len(VITALS)
+
+    def temporal(self):
+        """Returns (values, lag1, delta, roll_mean) lists for the current hour."""
+        values = self.current()
+        prev = self.buf[(self.head - 1) % WINDOW] if self.n_hours > 1 else None
+        lag1, delta, roll_mean = [], [], []
+        for j, val in enumerate(values):
+            p = prev[j] if prev is not None else math.nan
+            if p == p:
+                lag1.append(p)
+                delta.append(val - p)
+            else:
+                # Cold start: Lag1 = Current (Delta=0)
+                lag1.append(val)
+                delta.append(0.0 if val == val else math.nan)
+            roll_mean.append(self.sums[j] / self.counts[j] if self.counts[j] else val)
+        return values, lag1, delta, roll_mean
+
+    def temporal_dict(self):
+        """Current vitals (where known) plus the engineered features, keyed by column name."""
+        values, lag1, delta, roll_mean = self.temporal()
+        features = {}
+        for j, v in enumerate(VITALS):
+            if values[j] == values[j]:
+                features[v] = values[j]
+            features[f'{v}_Lag1'] = lag1[j]
+            features[f'{v}_Delta'] = delta[j]
+            features[f'{v}_RollMean6h'] = roll_mean[j]
+        return features
+
+def vital_keys(keys):
+    """
+    Input key of each vital (None if not sent): the exact name, else a case-insensitive
+    match ('hr' -> HR), the same way FeatureLayout.slot resolves input keys.
+    """
+    out = []
+    folded = None
+    for v in VITALS:
+        if v in keys:
+            out.append(v)
+            continue
+        if folded is None:
+            folded = {}
+            for k in keys:
+                if isinstance(k, str):
+                    folded.setdefault(k.strip().lower(), k)
+        out.append(folded.get(v.lower()))
+    return out
+
+def vitals_vector(data):
+    """Current vitals of a payload dict as a float list aligned with VITALS."""
+    current = []
+    for key in vital_keys(data):
+        try:
+            current.append(float(data[key]))
+        except (KeyError, TypeError, ValueError):
+            current.append(math.nan)
+    return current
@@ -0,0 +1,177 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the latency histogram buckets: 50 us .. 1 s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+
+class Counter:
+    """Monotonic counter with one label."""
+    type = 'counter'
+
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+class Histogram:
+    """Latency histogram with one label. Values per label: [bucket counts..., +Inf, sum]."""
+    type = 'histogram'
+
+    def __init__(self, name, help, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            values = self._values.get(label_value)
+            if values is None:
+                values = self._values[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[i] += 1
+            values[-1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {k: list(v) for k, v in self._values.items()}
+
+    def summary(self, label_value):
+        """Count, mean and p50/p95/p99 (as bucket upper bounds) of one label."""
+        with self._lock:
+            values = list(self._values.get(label_value, ()))
+        if not values:
+            return {"count": 0}
+        counts, total = values[:-1], values[-1]
+        n = sum(counts)
+        summary = {"count": n, "mean": total / n}
+        for q in (50, 95, 99):
+            rank, cumulative = n * q / 100.0, 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                if cumulative >= rank:
+                    break
+            summary[f"p{q}"] = bound
+        return summary
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, label):
+        metric = Counter(name, help, label)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, label, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, label, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for m in self.metrics:
+            with m._lock:
+                m._values = {}
+
+    def snapshot(self):
+        """Plain-dict copy of every metric (picklable, e.g. sent back by pool workers)."""
+        return {m.name: m.snapshot() for m in self.metrics}
+
+    def render(self, extra_snapshots=()):
+        """
+        Prometheus text exposition format. extra_snapshots (from other processes)
+        are added to this process's values.
+        """
+        lines = []
+        for m in self.metrics:
+            merged = m.snapshot()
+            for snap in extra_snapshots:
+                for key, values in snap.get(m.name, {}).items():
+                    if m.type == 'counter':
+                        merged[key] = merged.get(key, 0) + values
+                    elif key in merged:
+                        merged[key] = [a + b for a, b in zip(merged[key], values)]
+                    else:
+                        merged[key] = list(values)
+
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.type}")
+            for key in sorted(merged):
+                label = f'{m.label}="{_escape(key)}"'
+                if m.type == 'counter':
+                    lines.append(f"{m.name}{{{label}}} {merged[key]}")
+                    continue
+                values = merged[key]
+                cumulative = 0
+                for bound, count in zip(m.buckets + ('+Inf',), values[:-1]):
+                    cumulative += count
+                    lines.append(f'{m.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{m.name}_sum{{{label}}} {values[-1]}")
+                lines.append(f"{m.name}_count{{{label}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REGISTRY = Registry()
+
+# Scoring pipeline stages: validation, history, mapping, features, model, rules
+STAGE_SECONDS = REGISTRY.histogram(
+    'sepsis_stage_seconds', 'Time spent in each stage of the scoring path', 'stage'
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'sepsis_request_seconds', 'End-to-end HTTP request latency', 'endpoint'
+)
+ERRORS = REGISTRY.counter('sepsis_errors_total', 'Errors by stage', 'stage')
+ROWS_SCORED = REGISTRY.counter('sepsis_rows_scored_total', 'Rows scored by the model', 'mode')
+OVERRIDES = REGISTRY.counter('sepsis_rule_overrides_total', 'Clinical rule overrides', 'reason')
+DROPPED_READINGS = REGISTRY.counter(
+    'sepsis_dropped_readings_total', 'Patient readings not added to the history', 'reason'
+)
+
+# Per model version (see model_registry)
+MODEL_SECONDS = REGISTRY.histogram(
+    'sepsis_model_seconds', 'Model scoring latency per batch and model version', 'version'
+)
+MODEL_ROWS = REGISTRY.counter('sepsis_model_rows_total', 'Rows scored per model version', 'version')
+SHADOW_DIFF = REGISTRY.histogram(
+    'sepsis_shadow_abs_diff', 'Absolute probability difference of shadow vs served score', 'version',
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+)
+
+class RequestTimer:
+    """
+    ASGI middleware: records each request's latency per route and stores the
+    arrival time in scope["state"]["received_at"] (so handlers can time
+    body parsing and validation).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        scope.setdefault("state", {})["received_at"] = start
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            endpoint = f"{scope['method']} {route.path if route is not None else 'unmatched'}"
+            REQUEST_SECONDS.observe(endpoint, time.perf_counter() - start)
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+class Histogram:
+    """Counts of observed values in power-of-two buckets (<=1, <=2, <=4, ...)."""
+    def __init__(self, max_bucket):
+        self.bounds = [1]
+        while self.bounds[-1] < max_bucket:
+            self.bounds.append(self.bounds[-1] * 2)
+        self.counts = [0] * (len(self.bounds) + 1)  # last bucket: > max_bucket
+        self.total = 0
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.n += 1
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f"<={b}": c for b, c in zip(self.bounds, self.counts)}
+            buckets["+Inf"] = self.counts[-1]
+            return {
+                "count": self.n,
+                "mean": self.total / self.n if self.n else 0.0,
+                "buckets": buckets
+            }
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to max_wait_ms (or max_batch items) and
+    scores them with one call of score_batch(items) -> list of results.
+
+    The model call runs in the default executor, so the event loop keeps
+    accepting requests (and filling the next batch) while a batch is scored.
+    """
+    def __init__(self, score_batch, max_batch=64, max_wait_ms=2.0, max_concurrency=1):
+        self.score_batch = score_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        # Batches scored at the same time (e.g. one per worker process)
+        self.max_concurrency = max_concurrency
+        self.queue_depth = Histogram(max_batch * 4)
+        self.batch_size = Histogram(max_batch)
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._in_flight = set()  # keeps running batch tasks referenced
+
+    async def submit(self, item):
+        """Queues one item and waits for its own result (or exception)."""
+        loop = asyncio.get_running_loop()
+        # (Re)start the collector on this loop (e.g. a test client with a loop per call)
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self.queue_depth.observe(self._queue.qsize())
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 1. Wait for a free scoring slot and the first request,
+            #    then collect until the window closes
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Take whatever else is already queued, up to max_batch
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.batch_size.observe(len(batch))
+            task = loop.create_task(self._score(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _score(self, batch):
+        # 2. One vectorized call for the whole batch
+        items = [item for item, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.score_batch, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        # 3. Resolve each request with its own result
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # the client may have gone away
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth.snapshot(),
+            "batch_size": self.batch_size.snapshot()
+        }
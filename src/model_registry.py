@@ -0,0 +1,276 @@
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import ColumnBatch, SepsisPredictor
+from metrics import ERRORS, MODEL_ROWS, MODEL_SECONDS, SHADOW_DIFF
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('canary', 'shadow')
+
+# Readings a new model must score (finite, within [0, 1]) before it takes traffic:
+# empty, typical, deranged and non-numeric inputs
+WARMUP_PAYLOADS = [
+    {},
+    {'HR': 84, 'SBP': 123, 'MAP': 82, 'O2Sat': 97, 'Temp': 37.0, 'Resp': 18},
+    {'HR': 130, 'SBP': 85, 'MAP': 60, 'O2Sat': 88, 'Temp': 39.2, 'Resp': 30, 'Lactate': 4.5, 'WBC': 18},
+    {'HR': 35, 'O2Sat': 80, 'Age': 85, 'ICULOS': 2},
+    {'HR': 'n/a', 'Temp': None, 'ICULOS': 100},
+]
+
+def _take(payloads, rows):
+    if isinstance(payloads, ColumnBatch):
+        return payloads[rows]
+    return [payloads[i] for i in rows]
+
+class ModelVersion:
+    """
+    One loaded model: its predictor (or worker pool) plus in-flight tracking,
+    so a replaced version is closed only after its last batch returns.
+    """
+    def __init__(self, version, path, predictor, pool=None):
+        self.version = version
+        self.path = path
+        self.predictor = predictor
+        self.pool = pool
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+
+    def score(self, payloads):
+        """Scores (current_data, temporal) pairs or a ColumnBatch. Returns a list of probabilities."""
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.pool is not None:
+                return self.pool.score(payloads)
+            if isinstance(payloads, ColumnBatch):
+                return self.predictor.predict_columns(payloads).tolist()
+            batch = [current_data for current_data, _ in payloads]
+            temporals = [temporal for _, temporal in payloads]
+            return [float(p) for p in self.predictor.predict_batch(batch, temporals=temporals)]
+        finally:
+            MODEL_SECONDS.observe(self.version, time.perf_counter() - start)
+            MODEL_ROWS.inc(self.version, len(payloads))
+            with self._lock:
+                self.in_flight -= 1
+                self._drained.notify_all()
+
+    def explain(self, payloads, top_k=3, exact=False):
+        """Top-k drivers per (current_data, temporal) pair, computed in this process."""
+        batch = [current_data for current_data, _ in payloads]
+        temporals = [temporal for _, temporal in payloads]
+        return self.predictor.explain_batch(batch, temporals=temporals, top_k=top_k, exact=exact)
+
+    def cache_stats(self):
+        if self.predictor.cache is None:
+            return {"enabled": False}
+        if self.pool is not None:
+            return {"enabled": True, **self.pool.cache_stats()}
+        return {"enabled": True, **self.predictor.cache.stats()}
+
+    def close(self, timeout=30.0):
+        """Waits for in-flight batches (up to timeout), then stops the workers."""
+        with self._lock:
+            self._drained.wait_for(lambda: self.in_flight == 0, timeout)
+        if self.pool is not None:
+            self.pool.close()
+
+    def status(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+            "latency": MODEL_SECONDS.summary(self.version),
+            "workers": self.pool.health() if self.pool is not None else None,
+            "cache": self.cache_stats()
+        }
+
+class ModelRegistry:
+    """
+    Holds the active model and an optional candidate, and routes scoring calls.
+
+    load() builds and warms up a version without touching live traffic; activate()
+    then swaps it in with a single reference assignment (in-flight batches finish
+    on the version they started on, which is closed once drained).
+    A candidate gets `percent` % of the rows, either answering them (canary) or
+    scoring a copy in the background while the active model answers (shadow).
+
+    cache_factory: returns a fresh PredictionCache per version (or None)
+    n_workers: > 0 scores each version in its own WorkerPool
+    """
+    def __init__(self, cache_factory=None, n_workers=0):
+        self.cache_factory = cache_factory
+        self.n_workers = n_workers
+        self.active = None
+        self.candidate = None
+        self.role = None
+        self.percent = 0.0
+        self._lock = threading.Lock()
+        self._shadow = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sepsis-shadow")
+        self._random = random.Random()
+
+    def load(self, path, version):
+        """Loads and warms up a model version. Raises (and leaves traffic alone) if it fails."""
+        start = time.perf_counter()
+        predictor = SepsisPredictor(path)
+        if not predictor.feature_names:
+            raise ValueError(f"No feature names for {path} (missing {path}.features?)")
+
+        # Warm up before the caches are attached, so the warm-up rows neither
+        # fill them nor count as misses in their hit rate
+        payloads = WARMUP_PAYLOADS * math.ceil(64 / len(WARMUP_PAYLOADS))
+        probs = [float(p) for p in predictor.predict_batch(payloads)]
+        bad = [p for p in probs if not 0.0 <= p <= 1.0]
+        if len(probs) != len(payloads) or bad:
+            raise ValueError(f"Warm-up batch failed for {version}: {len(bad)} invalid outputs")
+        if self.cache_factory is not None:
+            predictor.cache = self.cache_factory()
+            predictor.explain_cache = self.cache_factory()
+
+        pool = None
+        if self.n_workers > 0:
+            from worker_pool import WorkerPool
+            # Forked after the warm-up: the workers share the warmed model and start
+            # with empty caches
+            pool = WorkerPool(predictor, self.n_workers)
+        loaded = ModelVersion(version, path, predictor, pool)
+
+        logger.info("Model loaded: version=%s path=%s load_seconds=%.2f",
+                    version, path, time.perf_counter() - start)
+        return loaded
+
+    def activate(self, loaded):
+        """Makes `loaded` the active model; the previous one is closed once drained."""
+        with self._lock:
+            previous, self.active = self.active, loaded
+            if self.candidate is loaded:
+                self.candidate, self.role, self.percent = None, None, 0.0
+        logger.info("Model active: version=%s", loaded.version)
+        self._retire(previous)
+
+    def set_candidate(self, loaded, role, percent):
+        if role not in ROLES:
+            raise ValueError(f"Unknown candidate role {role!r} (expected one of {ROLES})")
+        if not 0.0 <= percent <= 100.0:
+            raise ValueError("percent must be within [0, 100]")
+        with self._lock:
+            previous = self.candidate
+            self.candidate, self.role, self.percent = loaded, role, percent
+        logger.info("Model candidate: version=%s role=%s percent=%.1f", loaded.version, role, percent)
+        if previous is not loaded:
+            self._retire(previous)
+
+    def promote(self, version):
+        """Candidate -> active."""
+        candidate = self.candidate
+        if candidate is None or candidate.version != version:
+            raise KeyError(version)
+        self.activate(candidate)
+
+    def clear_candidate(self):
+        with self._lock:
+            previous = self.candidate
+            self.candidate, self.role, self.percent = None, None, 0.0
+        self._retire(previous)
+        return previous
+
+    def _retire(self, version):
+        if version is None or version is self.active or version is self.candidate:
+            return
+        threading.Thread(target=version.close, name=f"retire-{version.version}", daemon=True).start()
+
+    def score(self, payloads):
+        """
+        Scores (current_data, temporal) pairs or a ColumnBatch.
+        Returns a list of (probability, model version) pairs.
+        """
+        # One consistent view of the routing for this batch
+        with self._lock:
+            active, candidate, role, percent = self.active, self.candidate, self.role, self.percent
+        if active is None:
+            raise RuntimeError("No active model")
+
+        routed = []
+        if candidate is not None and percent > 0:
+            draw = self._random.random
+            routed = [i for i in range(len(payloads)) if draw() * 100.0 < percent]
+
+        if not routed or role == 'shadow':
+            probs = active.score(payloads)
+            results = [(p, active.version) for p in probs]
+            if routed:
+                subset = _take(payloads, routed)
+                self._shadow.submit(self._score_shadow, candidate, subset, [probs[i] for i in routed])
+            return results
+
+        # Canary: the routed rows are answered by the candidate
+        results = [None] * len(payloads)
+        routed_set = set(routed)
+        rest = [i for i in range(len(payloads)) if i not in routed_set]
+        for version, rows in ((candidate, routed), (active, rest)):
+            if rows:
+                probs = version.score(_take(payloads, rows))
+                for i, p in zip(rows, probs):
+                    results[i] = (p, version.version)
+        return results
+
+    def explain(self, payloads, versions, top_k=3, exact=False):
+        """
+        Explanations for scored rows, each from the model version that scored it
+        (`versions`, aligned with payloads; the active model if that one is gone).
+        """
+        loaded = {v.version: v for v in self.versions()}
+        rows = {}
+        for i, version in enumerate(versions):
+            rows.setdefault(loaded.get(version, self.active), []).append(i)
+
+        results = [None] * len(payloads)
+        for model, idx in rows.items():
+            for i, explanation in zip(idx, model.explain([payloads[i] for i in idx], top_k, exact)):
+                results[i] = explanation
+        return results
+
+    def _score_shadow(self, candidate, payloads, served):
+        try:
+            probs = candidate.score(payloads)
+        except Exception as e:
+            ERRORS.inc('shadow')
+            logger.error("Shadow scoring error: version=%s error=%s", candidate.version, e)
+            return
+        for p, q in zip(probs, served):
+            SHADOW_DIFF.observe(candidate.version, abs(p - q))
+
+    def versions(self):
+        return [v for v in (self.active, self.candidate) if v is not None]
+
+    def metrics_snapshots(self):
+        snapshots = []
+        for v in self.versions():
+            if v.pool is not None:
+                snapshots.extend(v.pool.metrics_snapshots())
+        return snapshots
+
+    def status(self):
+        with self._lock:
+            active, candidate, role, percent = self.active, self.candidate, self.role, self.percent
+        return {
+            "active": active.status() if active is not None else None,
+            "candidate": candidate.status() if candidate is not None else None,
+            "role": role,
+            "percent": percent,
+            # |candidate - active| probability on the shadowed rows
+            "shadow_diff": SHADOW_DIFF.summary(candidate.version) if role == 'shadow' else None
+        }
+
+    def close(self):
+        self._shadow.shutdown(wait=False)
+        for v in self.versions():
+            v.close(timeout=5.0)
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+from features import RollingState, vitals_vector
+from metrics import DROPPED_READINGS
+
+# Patients not seen for this long are treated as discharged and evicted
+DEFAULT_TTL_SECONDS = 12 * 3600
+
+class PatientHistory:
+    """RollingState of one patient plus the hour bucket of its current slot."""
+    __slots__ = ('state', 'hour', 'last_seen')
+
+    def __init__(self):
+        self.state = RollingState()
+        self.hour = None
+        self.last_seen = 0.0
+
+    def record(self, current, hour):
+        """
+        Records the vitals of the given hour bucket. Returns False (not recorded) for a
+        late reading of an hour before the current one: the past hours are already
+        folded into Lag1/Delta/RollMean6h, so it cannot be placed without rewriting them.
+        Several readings within one hour replace each other, as the training data is hourly.
+        """
+        if self.hour is None:
+            self.state.push(current)
+            self.hour = hour
+        elif hour < self.hour:
+            return False
+        elif hour == self.hour:
+            self.state.replace(current)
+        else:
+            self.state.carry_forward(hour - self.hour - 1)
+            self.state.push(current)
+            self.hour = hour
+        return True
+
+class PatientHistoryStore:
+    """
+    In-process store of PatientHistory keyed by patient ID, with TTL eviction.
+    Thread-safe (FastAPI runs sync handlers in a threadpool).
+    """
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._patients = OrderedDict()  # least recently seen first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._patients)
+
+    def __contains__(self, patient_id):
+        return patient_id in self._patients
+
+    def update(self, patient_id, current_data, timestamp=None):
+        """
+        Appends one vitals reading and returns the temporal features for it:
+        the forward-filled vitals plus {v}_Lag1, {v}_Delta and {v}_RollMean6h.
+        Returns None for a late reading (an hour before the patient's current one),
+        which is not recorded and counted in DROPPED_READINGS.
+
+        timestamp: epoch seconds of the reading (defaults to now)
+        """
+        with self._lock:
+            history = self._record(patient_id, vitals_vector(current_data), timestamp)
+            return None if history is None else history.state.temporal_dict()
+
+    def update_vitals(self, patient_id, current, timestamp=None):
+        """
+        update() for a vitals list aligned with VITALS (columnar input).
+        Returns the (values, lag1, delta, roll_mean) lists, or None for a late reading.
+        """
+        with self._lock:
+            history = self._record(patient_id, current, timestamp)
+            return None if history is None else history.state.temporal()
+
+    def _record(self, patient_id, current, timestamp):
+        now = time.time()
+        if timestamp is None:
+            timestamp = now
+        self._evict_expired(now)
+        history = self._patients.get(patient_id)
+        if history is None:
+            history = PatientHistory()
+            self._patients[patient_id] = history
+        else:
+            self._patients.move_to_end(patient_id)
+        history.last_seen = now
+        if not history.record(current, int(timestamp // 3600)):
+            DROPPED_READINGS.inc('late')
+            return None
+        return history
+
+    def restore(self, patients):
+        """
+        Rebuilds histories in bulk (EventLog.replay on startup).
+        patients: {patient_id: (last_seen, [(hour, vitals vector), ...] in arrival order)}
+        """
+        restored = []
+        for patient_id, (last_seen, readings) in patients.items():
+            history = PatientHistory()
+            for hour, current in readings:
+                history.record(current, hour)
+            history.last_seen = last_seen
+            restored.append((patient_id, history))
+        restored.sort(key=lambda item: item[1].last_seen)
+
+        with self._lock:
+            for patient_id, history in restored:
+                self._patients.pop(patient_id, None)
+                self._patients[patient_id] = history
+        return len(restored)
+
+    def discharge(self, patient_id):
+        with self._lock:
+            return self._patients.pop(patient_id, None) is not None
+
+    def evict_expired(self, now=None):
+        with self._lock:
+            return self._evict_expired(time.time() if now is None else now)
+
+    def _evict_expired(self, now):
+        cutoff = now - self.ttl_seconds
+        evicted = 0
+        while self._patients:
+            patient_id, history = next(iter(self._patients.items()))
+            if history.last_seen >= cutoff:
+                break
+            del self._patients[patient_id]
+            evicted += 1
+        return evicted
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_TTL_SECONDS = 300
+
+def row_keys(X, decimals=3):
+    """
+    Canonical key per row of a model input matrix: values rounded to `decimals`,
+    -0.0 folded into 0.0 and every NaN written the same way, as float32 bytes
+    (hashed by the dict). Vitals are charted with at most 1-2 decimals, so
+    rounding only merges representation noise (e.g. 0.1 + 0.2 vs 0.3).
+    """
+    Q = np.round(np.asarray(X, dtype=np.float64), decimals) + 0.0
+    Q[np.isnan(Q)] = np.nan
+    Q = Q.astype(np.float32)
+    data = Q.tobytes()
+    width = Q.shape[1] * Q.itemsize
+    return [data[i:i + width] for i in range(0, len(data), width)]
+
+class PredictionCache:
+    """
+    Bounded LRU cache of model probabilities keyed on the engineered feature
+    vector (see row_keys), with a TTL per entry. Thread-safe.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl_seconds=DEFAULT_TTL_SECONDS, decimals=3):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self._entries = OrderedDict()  # key -> (probability, expires_at), least recent first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self, X):
+        return row_keys(X, self.decimals)
+
+    def get_many(self, keys):
+        """Cached probability per key, or None on a miss (expired entries count as misses)."""
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] < now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    out.append(entry[0])
+        return out
+
+    def put_many(self, keys, values):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
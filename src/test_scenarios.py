@@ -10,15 +10,14 @@ sys.path.append(os.path.dirname(__file__))
 
 from inference import SepsisPredictor
 from clinical_rules import apply_clinical_rules
+from thresholds import risk_label
 
 # --- CONFIGURATION ---
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'sepsis_xgboost.pkl')
 
 def get_risk_label(prob):
-    # CALIBRATED THRESHOLDS
-    if prob >= 0.22: return "CRITICAL"
-    if prob >= 0.08: return "WARNING"
-    return "STABLE"
+    # CALIBRATED THRESHOLDS (thresholds.py / tuning artifact)
+    return risk_label(prob)
 
 # --- SCENARIO DEFINITIONS ---
 scenarios = [
@@ -0,0 +1,36 @@
+import json
+import os
+
+import numpy as np
+
+# Calibrated risk levels (The "Whisper" Fix): used until tune_model.py writes an artifact
+DEFAULT_THRESHOLDS = {'critical': 0.22, 'warning': 0.08}
+
+# Tuning artifact written by tune_model.py (chosen hyperparameters + alert thresholds)
+TUNING_PATH = os.environ.get(
+    "SEPSIS_TUNING_PATH", os.path.join(os.path.dirname(__file__), 'sepsis_tuning.json')
+)
+
+def load_thresholds(path=TUNING_PATH):
+    """CRITICAL/WARNING cutoffs from the tuning artifact, or the defaults if there is none."""
+    if not path or not os.path.exists(path):
+        return dict(DEFAULT_THRESHOLDS)
+    with open(path) as f:
+        thresholds = json.load(f)['thresholds']
+    critical, warning = float(thresholds['critical']), float(thresholds['warning'])
+    if not 0.0 <= warning <= critical <= 1.0:
+        raise ValueError(f"Invalid thresholds in {path}: critical={critical}, warning={warning}")
+    return {'critical': critical, 'warning': warning}
+
+THRESHOLDS = load_thresholds()
+
+def risk_label(prob, thresholds=THRESHOLDS):
+    if prob >= thresholds['critical']: return "CRITICAL"
+    if prob >= thresholds['warning']: return "WARNING"
+    return "STABLE"
+
+def risk_labels(probs, thresholds=THRESHOLDS):
+    """risk_label over an array of probabilities."""
+    probs = np.asarray(probs)
+    return np.where(probs >= thresholds['critical'], "CRITICAL",
+                    np.where(probs >= thresholds['warning'], "WARNING", "STABLE")).astype(object)
@@ -3,30 +3,85 @@ import numpy as np
 import xgboost as xgb
 from sklearn.metrics import roc_auc_score, average_precision_score, confusion_matrix, classification_report
 import joblib
+import json
 import os
-import matplotlib.pyplot as plt
+import zlib
 from data_loader import DataLoader
+from tree_runtime import compile_booster_json
+from evaluation import CohortEvaluation, print_report
+
+def is_val_patient(patient_ids, val_fraction):
+    """
+    Deterministic patient-level split for streamed data: a patient is in the
+    validation set if the CRC32 of its ID falls in the first val_fraction of the range.
+    Returns a boolean mask aligned with patient_ids.
+    """
+    if not isinstance(patient_ids.dtype, pd.CategoricalDtype):
+        patient_ids = patient_ids.astype('category')
+    cutoff = val_fraction * 2**32
+    flags = np.array([zlib.crc32(str(pid).encode()) < cutoff
+                      for pid in patient_ids.cat.categories], dtype=bool)
+    codes = patient_ids.cat.codes.to_numpy()
+    return flags[codes] if len(flags) else np.zeros(len(codes), dtype=bool)
+
+class PatientChunkIter(xgb.DataIter):
+    """
+    Streams processed chunks (e.g. DataLoader.load_data_stream) into XGBoost,
+    keeping only the patients of one partition ('train' or 'val').
+    """
+    def __init__(self, make_chunks, feature_names, partition='train', val_fraction=0.0,
+                 cache_prefix=None):
+        super().__init__(cache_prefix=cache_prefix)
+        self.make_chunks = make_chunks
+        self.feature_names = feature_names
+        self.partition = partition
+        self.val_fraction = val_fraction
+        self._chunks = None
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter(self.make_chunks())
+        for chunk in self._chunks:
+            if self.val_fraction > 0:
+                in_val = is_val_patient(chunk['Patient_ID'], self.val_fraction)
+                chunk = chunk[in_val if self.partition == 'val' else ~in_val]
+            if len(chunk) == 0:
+                continue
+            input_data(
+                data=chunk[self.feature_names].to_numpy(dtype=np.float32),
+                label=chunk['SepsisLabel'].to_numpy(),
+                feature_names=self.feature_names
+            )
+            return True
+        return False
 
 class SepsisModel:
     def __init__(self):
         self.model = None
 
-    def train(self, X_train, y_train, X_val, y_val):
+    def train(self, X_train, y_train, X_val, y_val, params=None, n_estimators=100, feature_names=None):
+        """
+        params: hyperparameters overriding the defaults (e.g. the tune_model.py artifact)
+        feature_names: column names when X_train/X_val are arrays (e.g. FeatureSplits views)
+        """
         print("Initializing XGBoost Classifier...")
         # Calculate scale_pos_weight
         ratio = float(np.sum(y_train == 0)) / np.sum(y_train == 1)
         print(f"Class Imbalance Ratio (Neg/Pos): {ratio:.2f}")
 
+        hyperparams = {'max_depth': 6, 'learning_rate': 0.1, **(params or {})}
         self.model = xgb.XGBClassifier(
             objective='binary:logistic',
-            n_estimators=100,
-            max_depth=6,
-            learning_rate=0.1,
+            n_estimators=n_estimators,
             scale_pos_weight=ratio, # Handle imbalance,
             early_stopping_rounds=10,
             use_label_encoder=False,
             eval_metric='auc',
-            random_state=42
+            random_state=42,
+            **hyperparams
         )
 
         print("Training model...")
@@ -35,12 +90,88 @@ class SepsisModel:
             eval_set=[(X_train, y_train), (X_val, y_val)],
             verbose=True
         )
+        if feature_names is not None:
+            # Arrays carry no column names: SepsisPredictor maps inputs by these
+            self.model.get_booster().feature_names = list(feature_names)
         print("Training complete.")
 
-    def evaluate(self, X_test, y_test):
+    def train_streaming(self, loader, chunksize=100_000, val_fraction=0.1, nthread=None,
+                        external_memory=False, cache_dir=None, n_estimators=100):
+        """
+        Out-of-core training for datasets larger than RAM.
+        Processed chunks from loader.load_data_stream() go through a DataIter into a
+        QuantileDMatrix (quantized in memory, ~1 byte per value) or, with
+        external_memory=True, an external-memory matrix cached on disk.
+        Uses the hist tree method with explicit nthread (default: all cores) and
+        only evaluates on the validation patients (val_fraction=0 disables it).
+        """
+        nthread = nthread or os.cpu_count()
+        # Medians once up front, so every pass over the data reuses them
+        medians = loader.compute_medians(chunksize)
+        make_chunks = lambda: loader.load_data_stream(chunksize, medians=medians)
+
+        first = next(iter(make_chunks()))
+        feature_names = [c for c in first.columns if c not in ('SepsisLabel', 'Patient_ID')]
+        del first
+
+        print(f"Building training matrix ({'external memory' if external_memory else 'in memory'})...")
+        if external_memory:
+            cache_prefix = os.path.join(cache_dir or '.', 'xgb_cache')
+            train_iter = PatientChunkIter(make_chunks, feature_names, 'train', val_fraction,
+                                          cache_prefix=cache_prefix)
+            if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+                dtrain = xgb.ExtMemQuantileDMatrix(train_iter, nthread=nthread)
+            else:
+                dtrain = xgb.DMatrix(train_iter, nthread=nthread)
+        else:
+            train_iter = PatientChunkIter(make_chunks, feature_names, 'train', val_fraction)
+            dtrain = xgb.QuantileDMatrix(train_iter, nthread=nthread)
+
+        evals = []
+        if val_fraction > 0:
+            val_iter = PatientChunkIter(make_chunks, feature_names, 'val', val_fraction)
+            dval = xgb.QuantileDMatrix(val_iter, ref=dtrain, nthread=nthread)
+            evals = [(dval, 'val')]
+
+        # Calculate scale_pos_weight
+        labels = dtrain.get_label()
+        ratio = float(np.sum(labels == 0)) / np.sum(labels == 1)
+        print(f"Train rows: {dtrain.num_row()}, Class Imbalance Ratio (Neg/Pos): {ratio:.2f}")
+
+        params = {
+            'objective': 'binary:logistic',
+            'tree_method': 'hist',
+            'nthread': nthread,
+            'max_depth': 6,
+            'learning_rate': 0.1,
+            'scale_pos_weight': ratio, # Handle imbalance
+            'eval_metric': 'auc',
+            'seed': 42
+        }
+        print(f"Training model (hist, nthread={nthread})...")
+        booster = xgb.train(
+            params, dtrain,
+            num_boost_round=n_estimators,
+            evals=evals,
+            early_stopping_rounds=10 if evals else None,
+            verbose_eval=True
+        )
+
+        # Wrap in the sklearn API so save_model() / SepsisPredictor work unchanged
+        self.model = xgb.XGBClassifier()
+        self.model.load_model(bytearray(booster.save_raw('ubj')))
+        print("Training complete.")
+        return self.model
+
+    def evaluate(self, X_test, y_test, patient_ids=None, n_boot=0, workers=None, feature_names=None):
+        """
+        Row-level metrics on the test set (scored once). With patient_ids, also the
+        cohort report: lead times, alert burden and, with n_boot > 0, bootstrap CIs.
+        feature_names: column names when X_test is an array (e.g. a FeatureSplits view)
+        """
         print("\nEvaluating on Test Set...")
         y_probs = self.model.predict_proba(X_test)[:, 1]
-        y_preds = self.model.predict(X_test)
+        y_preds = (y_probs > 0.5).astype(int)
 
         auc = roc_auc_score(y_test, y_probs)
         auprc = average_precision_score(y_test, y_probs)
@@ -54,27 +185,87 @@ class SepsisModel:
 
         # Identify Top Features
         importances = self.model.feature_importances_
-        feature_names = X_test.columns
+        if feature_names is None:
+            feature_names = list(X_test.columns)
         feature_imp = pd.DataFrame({'Feature': feature_names, 'Importance': importances})
         feature_imp = feature_imp.sort_values('Importance', ascending=False).head(10)
         print("\nTop 10 Features:")
         print(feature_imp)
-        
+
+        if patient_ids is not None:
+            print("\nCohort Evaluation:")
+            # One column (a view for arrays), not a copy of the whole matrix
+            if isinstance(X_test, pd.DataFrame):
+                hours = X_test['Hour'].to_numpy()
+            else:
+                hours = X_test[:, feature_names.index('Hour')]
+            evaluation = CohortEvaluation(y_probs, np.asarray(y_test), patient_ids, hours)
+            print_report(evaluation.report(n_boot, workers))
+
         return auc, auprc
 
     def save_model(self, path='sepsis_xgboost.pkl'):
         print(f"Saving model to {path}...")
         joblib.dump(self.model, path)
 
+    def export_model(self, base_path='sepsis_xgboost'):
+        """
+        Serving artifacts that need no pickle/sklearn:
+          <base_path>.json - native XGBoost JSON (load with xgb.Booster(model_file=...))
+          <base_path>.npz  - flattened tree arrays for tree_runtime.TreeEnsemble (NumPy only)
+        """
+        booster = self.model.get_booster()
+        json_path, npz_path = base_path + '.json', base_path + '.npz'
+        print(f"Exporting model to {json_path} and {npz_path}...")
+        booster.save_model(json_path)
+        np.savez(npz_path, **compile_booster_json(booster.save_raw('json')))
+        return json_path, npz_path
+
 if __name__ == "__main__":
-    # Load and Preprocess
-    loader = DataLoader(r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\Dataset.csv')
-    loader.load_data()
-    loader.preprocess()
-    X_train, y_train, X_val, y_val, X_test, y_test = loader.split_data()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the Clinivora sepsis model")
+    parser.add_argument("--stream", action="store_true",
+                        help="Out-of-core training from CSV chunks (datasets larger than RAM)")
+    parser.add_argument("--external-memory", action="store_true",
+                        help="With --stream: keep the quantized matrix on disk")
+    parser.add_argument("--nthread", type=int, default=None, help="Training threads (default: all cores)")
+    parser.add_argument("--tuning", metavar="TUNING_JSON",
+                        help="Train with the hyperparameters of a tune_model.py artifact")
+    parser.add_argument("--boot", type=int, default=1000,
+                        help="Patient-level bootstrap replicates for the test-set CIs (0 = none)")
+    parser.add_argument("--export", metavar="MODEL_PKL",
+                        help="Only export an already trained model (.pkl) to .json/.npz and exit")
+    args = parser.parse_args()
 
-    # Train and Evaluate
     trainer = SepsisModel()
-    trainer.train(X_train, y_train, X_val, y_val)
-    trainer.evaluate(X_test, y_test)
-    trainer.save_model(r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\src\sepsis_xgboost.model')
+    if args.export:
+        trainer.model = joblib.load(args.export)
+        trainer.export_model(os.path.splitext(args.export)[0])
+    else:
+        loader = DataLoader(r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\Dataset.csv')
+
+        if args.stream:
+            # Out-of-core: no full frame in RAM, evaluation on held-out patients only
+            trainer.train_streaming(loader, nthread=args.nthread, external_memory=args.external_memory)
+        else:
+            # Load and Preprocess
+            loader.load_processed()
+            # One float32 matrix; train/val/test are views of it (no per-split copies)
+            splits = loader.split_views()
+            X_train, y_train = splits.part('train')
+            X_val, y_val = splits.part('val')
+            X_test, y_test = splits.part('test')
+
+            # Train and Evaluate
+            tuning = {'params': None, 'n_estimators': 100}
+            if args.tuning:
+                with open(args.tuning) as f:
+                    tuning = json.load(f)
+            trainer.train(X_train, y_train, X_val, y_val, params=tuning['params'],
+                          n_estimators=tuning['n_estimators'], feature_names=splits.feature_names)
+            test_patients = loader.processed_df['Patient_ID'].to_numpy()[splits.test_idx]
+            trainer.evaluate(X_test, y_test, test_patients, n_boot=args.boot,
+                             feature_names=splits.feature_names)
+
+        trainer.save_model(r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\src\sepsis_xgboost.model')
+        trainer.export_model(r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\src\sepsis_xgboost')
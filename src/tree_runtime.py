@@ -0,0 +1,113 @@
+import json
+import numpy as np
+
+# Flattened tree-array format written by SepsisModel.export_model (.npz, no pickle).
+# All trees are concatenated into flat node arrays; leaves point to themselves,
+# so traversal is max_depth rounds of gather + compare for the whole batch.
+
+def _parse_float(value):
+    # XGBoost >= 3 writes base_score as "[5E-1]"
+    return float(str(value).strip('[]'))
+
+def compile_booster_json(model_json):
+    """
+    Flattens a native XGBoost JSON model (Booster.save_raw('json')) into node arrays.
+    Only binary:logistic models with numerical splits are supported.
+    """
+    if isinstance(model_json, (bytes, bytearray, str)):
+        model_json = json.loads(model_json)
+    learner = model_json['learner']
+
+    objective = learner['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Unsupported objective for the NumPy runtime: {objective}")
+
+    base_score = _parse_float(learner['learner_model_param']['base_score'])
+    trees = learner['gradient_booster']['model']['trees']
+    best_iteration = learner.get('attributes', {}).get('best_iteration')
+    if best_iteration is not None:
+        # Same trees as XGBClassifier.predict_proba after early stopping
+        trees = trees[:int(best_iteration) + 1]
+
+    left, right, feature, threshold, default_left, value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        lc = np.asarray(tree['left_children'], dtype=np.int64)
+        rc = np.asarray(tree['right_children'], dtype=np.int64)
+        n_nodes = len(lc)
+        nodes = np.arange(n_nodes)
+        is_leaf = lc == -1
+
+        left.append(np.where(is_leaf, nodes, lc) + offset)
+        right.append(np.where(is_leaf, nodes, rc) + offset)
+        feature.append(np.where(is_leaf, 0, tree['split_indices']))
+        cond = np.asarray(tree['split_conditions'], dtype=np.float32)
+        threshold.append(np.where(is_leaf, np.float32(0), cond))
+        default_left.append(np.asarray(tree['default_left'], dtype=bool))
+        # For leaves, split_conditions holds the leaf value
+        value.append(np.where(is_leaf, cond, np.float32(0)))
+        roots.append(offset)
+
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        for node in range(n_nodes):  # children always have larger ids than parents
+            if not is_leaf[node]:
+                depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+        offset += n_nodes
+
+    return {
+        'feature_names': np.asarray(learner.get('feature_names') or [], dtype=str),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float32),
+        'default_left': np.concatenate(default_left),
+        'value': np.concatenate(value).astype(np.float32),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int32(max_depth),
+        'base_margin': np.float64(np.log(base_score / (1 - base_score))),
+    }
+
+class TreeEnsemble:
+    """
+    NumPy-only scorer for the flattened format: no pandas, sklearn or xgboost
+    at serving time. Vectorized over the batch and all trees at once.
+    """
+    def __init__(self, arrays):
+        self.feature_names = [str(f) for f in arrays['feature_names']]
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.default_left = arrays['default_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.base_margin = float(arrays['base_margin'])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            return cls({k: f[k] for k in f.files})
+
+    def leaves(self, X):
+        """Leaf node id of every (row, tree)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        node = np.repeat(self.roots[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self.feature[node]]
+            # NaN compares False, so missing values take default_left
+            go_left = (x < self.threshold[node]) | (np.isnan(x) & self.default_left[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_margin(self, X):
+        return self.value[self.leaves(X)].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def predict_proba(self, X):
+        """Probability of the positive class, like XGBClassifier.predict_proba(X)[:, 1]."""
+        return (1.0 / (1.0 + np.exp(-self.predict_margin(X)))).astype(np.float32)
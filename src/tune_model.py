@@ -0,0 +1,278 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.dirname(__file__))
+
+from clinical_rules import engine
+from data_loader import DataLoader
+from thresholds import TUNING_PATH
+
+# --- CONFIGURATION ---
+DATA_PATH = r'c:\Users\Admin\Desktop\mimic-iv-clinical-database-demo-2.2\Dataset.csv'
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 20
+
+# Search space: name -> (kind, low, high)
+SEARCH_SPACE = {
+    'max_depth': ('int', 3, 8),
+    'learning_rate': ('log', 0.02, 0.3),
+    'min_child_weight': ('log', 1.0, 20.0),
+    'subsample': ('float', 0.6, 1.0),
+    'colsample_bytree': ('float', 0.5, 1.0),
+    'reg_lambda': ('log', 0.1, 10.0),
+}
+
+# The current SepsisModel.train settings, always tried first as the baseline
+BASELINE_PARAMS = {'max_depth': 6, 'learning_rate': 0.1}
+
+def sample_params(rng):
+    params = {}
+    for name, (kind, low, high) in SEARCH_SPACE.items():
+        if kind == 'int':
+            params[name] = int(rng.integers(low, high + 1))
+        elif kind == 'log':
+            params[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+def threshold_for_sensitivity(probs, labels, target):
+    """
+    Highest cutoff t such that (probs >= t) catches at least `target` of the positives,
+    rounded down to 4 decimals (rounding down only adds alerts).
+    """
+    pos = np.sort(probs[labels == 1])[::-1]
+    if len(pos) == 0:
+        raise ValueError("No positive rows to set a threshold on")
+    k = max(1, math.ceil(target * len(pos)))
+    return math.floor(float(pos[k - 1]) * 1e4) / 1e4
+
+def alert_metrics(probs, labels, threshold):
+    """Row-level sensitivity, specificity, PPV and alert rate of (probs >= threshold)."""
+    alert = probs >= threshold
+    pos = labels == 1
+    tp = int(np.sum(alert & pos))
+    fp = int(np.sum(alert & ~pos))
+    n_pos, n_neg = int(pos.sum()), int((~pos).sum())
+    return {
+        'threshold': threshold,
+        'sensitivity': tp / n_pos if n_pos else None,
+        'specificity': (n_neg - fp) / n_neg if n_neg else None,
+        'ppv': tp / (tp + fp) if tp + fp else None,
+        'alert_rate': float(alert.mean())
+    }
+
+# --- Worker side ---
+# The feature matrix is shared as one memory-mapped .npy; each worker quantizes a
+# fold once and reuses it for every trial it runs on that fold
+_X = _y = _folds = None
+_nthread = 1
+_fold_matrices = {}
+
+def _init_worker(x_path, y, folds, nthread):
+    global _X, _y, _folds, _nthread
+    _X = np.load(x_path, mmap_mode='r')
+    _y, _folds, _nthread = y, folds, nthread
+    _fold_matrices.clear()
+
+def _fold_matrix(fold):
+    if fold not in _fold_matrices:
+        import xgboost as xgb
+        train_idx, val_idx = _folds[fold]
+        dtrain = xgb.QuantileDMatrix(_X[train_idx], label=_y[train_idx], nthread=_nthread)
+        dval = xgb.QuantileDMatrix(_X[val_idx], label=_y[val_idx], ref=dtrain, nthread=_nthread)
+        _fold_matrices[fold] = (dtrain, dval)
+    return _fold_matrices[fold]
+
+def run_fold(trial, fold, params, max_rounds, early_stopping_rounds):
+    """Trains one early-stopped booster on a fold. Returns its scores and validation predictions."""
+    import xgboost as xgb
+    from sklearn.metrics import average_precision_score, roc_auc_score
+
+    start = time.perf_counter()
+    dtrain, dval = _fold_matrix(fold)
+    labels = dtrain.get_label()
+    booster = xgb.train(
+        {
+            'objective': 'binary:logistic',
+            'tree_method': 'hist',
+            'eval_metric': 'auc',
+            'nthread': _nthread,
+            'seed': 42,
+            # Handle imbalance
+            'scale_pos_weight': float(np.sum(labels == 0)) / max(1, np.sum(labels == 1)),
+            **params
+        },
+        dtrain,
+        num_boost_round=max_rounds,
+        evals=[(dval, 'val')],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=False
+    )
+    best_iteration = booster.best_iteration
+    probs = booster.predict(dval, iteration_range=(0, best_iteration + 1)).astype(np.float32)
+    y_val = dval.get_label()
+    return {
+        'trial': trial,
+        'fold': fold,
+        'best_iteration': int(best_iteration),
+        'auc': float(roc_auc_score(y_val, probs)),
+        'auprc': float(average_precision_score(y_val, probs)),
+        'seconds': time.perf_counter() - start,
+        'probs': probs
+    }
+
+# --- Driver side ---
+def tune(loader, n_trials=20, n_folds=3, workers=None, max_rounds=MAX_ROUNDS,
+         early_stopping_rounds=EARLY_STOPPING_ROUNDS, critical_sensitivity=0.80,
+         warning_sensitivity=0.95, seed=42, workdir=None):
+    """
+    Random search over SEARCH_SPACE with patient-grouped CV folds, one process per
+    (trial, fold) task. The best trial (mean validation AUC) sets the hyperparameters;
+    its pooled out-of-fold predictions, after the clinical rule overrides, set the
+    CRITICAL/WARNING thresholds at the target sensitivities. Returns the tuning
+    artifact as a dict.
+    """
+    workers = workers or os.cpu_count()
+    folds, test_idx = loader.split_folds(n_folds)
+    rng = np.random.default_rng(seed)
+    trials = [dict(BASELINE_PARAMS)] + [sample_params(rng) for _ in range(n_trials - 1)]
+    print(f"Tuning: {len(trials)} trials x {len(folds)} folds on {workers} workers "
+          f"({len(test_idx)} test rows held out)")
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        # The training split's matrix, memory-mapped for the workers; the folds
+        # are re-indexed from processed_df rows to its rows
+        x_path = os.path.join(tmp, 'features.npy')
+        splits = loader.split_views(mmap_path=x_path)
+        feature_names, y = splits.feature_names, splits.y.astype(np.int8)
+        folds = [(splits.positions(train_idx), splits.positions(val_idx)) for train_idx, val_idx in folds]
+        # Clinical rule inputs per row: serving compares the thresholds after the rule overrides
+        F = np.full((len(y), len(engine.features)), np.nan)
+        for j, name in enumerate(engine.features):
+            if name in feature_names:
+                F[:, j] = splits.X[:, feature_names.index(name)]
+        del splits
+        # Cores split between the workers
+        nthread = max(1, (os.cpu_count() or 1) // workers)
+        pool_args = {'initializer': _init_worker, 'initargs': (x_path, y, folds, nthread)}
+        if 'fork' in multiprocessing.get_all_start_methods():
+            pool_args['mp_context'] = multiprocessing.get_context('fork')
+
+        start = time.perf_counter()
+        results = {i: [] for i in range(len(trials))}
+        best = None  # (mean auc, trial, fold results)
+        with ProcessPoolExecutor(workers, **pool_args) as pool:
+            futures = [
+                pool.submit(run_fold, trial, fold, params, max_rounds, early_stopping_rounds)
+                for trial, params in enumerate(trials) for fold in range(len(folds))
+            ]
+            for future in as_completed(futures):
+                r = future.result()
+                done = results[r['trial']]
+                done.append(r)
+                if len(done) < len(folds):
+                    continue
+                # Trial complete: keep the predictions only while it is the best so far
+                mean_auc = float(np.mean([d['auc'] for d in done]))
+                print(f"  trial {r['trial']:>3}: AUC {mean_auc:.4f}, rounds "
+                      f"{int(np.mean([d['best_iteration'] for d in done])) + 1} "
+                      f"({time.perf_counter() - start:.1f}s)")
+                if best is not None and mean_auc <= best[0]:
+                    discard = done
+                else:
+                    discard = best[2] if best is not None else []
+                    best = (mean_auc, r['trial'], done)
+                for d in discard:
+                    d['probs'] = None
+
+    # Thresholds on the best trial's pooled out-of-fold predictions after the clinical
+    # rules, as served (the rules read the imputed matrix, not the raw request values)
+    _, best_trial, best_folds = best
+    best_folds = sorted(best_folds, key=lambda d: d['fold'])
+    val_rows = np.concatenate([folds[d['fold']][1] for d in best_folds])
+    model_probs = np.concatenate([d['probs'] for d in best_folds])
+    probs, rule_index = engine.evaluate(model_probs, F[val_rows])
+    labels = y[val_rows]
+    critical = threshold_for_sensitivity(probs, labels, critical_sensitivity)
+    warning = min(critical, threshold_for_sensitivity(probs, labels, warning_sensitivity))
+
+    summary = []
+    for trial, params in enumerate(trials):
+        done = results[trial]
+        summary.append({
+            'trial': trial,
+            'params': params,
+            'auc_mean': float(np.mean([d['auc'] for d in done])),
+            'auc_std': float(np.std([d['auc'] for d in done])),
+            'auprc_mean': float(np.mean([d['auprc'] for d in done])),
+            'rounds_mean': float(np.mean([d['best_iteration'] + 1 for d in done]))
+        })
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'data': {
+            'path': loader.filepath,
+            'rows': int(len(y)),
+            'patients': int(loader.processed_df['Patient_ID'].nunique()),
+            'n_features': len(feature_names),
+            'folds': len(folds),
+            'test_rows_held_out': int(len(test_idx))
+        },
+        'params': trials[best_trial],
+        # Mean early-stopped rounds of the best trial: the final model's n_estimators
+        'n_estimators': int(round(summary[best_trial]['rounds_mean'])),
+        'cv': {k: summary[best_trial][k] for k in ('auc_mean', 'auc_std', 'auprc_mean')},
+        'target_sensitivity': {'critical': critical_sensitivity, 'warning': warning_sensitivity},
+        'thresholds': {'critical': critical, 'warning': warning},
+        # Out-of-fold alert metrics of the final (rule-applied) probabilities
+        'threshold_metrics': {
+            'critical': alert_metrics(probs, labels, critical),
+            'warning': alert_metrics(probs, labels, warning)
+        },
+        'rule_override_rate': float(np.mean(rule_index >= 0)),
+        'trials': summary
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter and alert-threshold search")
+    parser.add_argument("--data", default=DATA_PATH, help="Cohort CSV (preprocessed through the feature cache)")
+    parser.add_argument("--cache-dir", default=None, help="Feature cache directory")
+    parser.add_argument("--trials", type=int, default=20, help="Parameter sets to try (the first is the current baseline)")
+    parser.add_argument("--folds", type=int, default=3, help="Patient-grouped CV folds per trial")
+    parser.add_argument("--workers", type=int, default=None, help="Training processes (default: all cores)")
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS, help="Boosting rounds cap per fold")
+    parser.add_argument("--early-stopping", type=int, default=EARLY_STOPPING_ROUNDS,
+                        help="Stop a fold after this many rounds without validation AUC gain")
+    parser.add_argument("--critical-sensitivity", type=float, default=0.80,
+                        help="Share of septic rows at or above the CRITICAL threshold")
+    parser.add_argument("--warning-sensitivity", type=float, default=0.95,
+                        help="Share of septic rows at or above the WARNING threshold")
+    parser.add_argument("--seed", type=int, default=42, help="Search seed")
+    parser.add_argument("--output", default=TUNING_PATH, help="Tuning artifact (JSON) loaded by serving")
+    args = parser.parse_args()
+
+    loader = DataLoader(args.data)
+    loader.load_processed(args.cache_dir)
+    artifact = tune(loader, args.trials, args.folds, args.workers, args.max_rounds,
+                    args.early_stopping, args.critical_sensitivity, args.warning_sensitivity, args.seed)
+
+    with open(args.output, 'w') as f:
+        json.dump(artifact, f, indent=2)
+    print(f"\nBest params: {artifact['params']} (n_estimators={artifact['n_estimators']})")
+    print(f"CV AUC: {artifact['cv']['auc_mean']:.4f} +/- {artifact['cv']['auc_std']:.4f}")
+    for level in ('critical', 'warning'):
+        m = artifact['threshold_metrics'][level]
+        print(f"{level.upper():<8} >= {m['threshold']:.4f}: sensitivity {m['sensitivity']:.3f}, "
+              f"specificity {m['specificity']:.3f}, alert rate {m['alert_rate']:.3f}")
+    print(f"[SUCCESS] Tuning artifact saved to '{args.output}'")
@@ -0,0 +1,196 @@
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import ColumnBatch
+from metrics import REGISTRY
+
+# Smallest chunk worth sending to a separate worker when splitting a large batch
+MIN_CHUNK = 32
+
+def _worker_main(predictor, conn):
+    """Worker loop: scores (current_data, temporal) lists or ColumnBatches received over the pipe."""
+    # Counters start from zero in each worker (the fork copies the parent's)
+    REGISTRY.reset()
+    # One core per worker; the pool provides the parallelism
+    if predictor.booster is not None:
+        predictor.booster.set_param({'nthread': 1})
+    while True:
+        try:
+            payloads = conn.recv()
+        except EOFError:
+            break
+        if payloads is None:
+            break
+        try:
+            if isinstance(payloads, ColumnBatch):
+                probs = predictor.predict_columns(payloads)
+            else:
+                batch = [current_data for current_data, _ in payloads]
+                temporals = [temporal for _, temporal in payloads]
+                probs = predictor.predict_batch(batch, temporals=temporals)
+            result = [float(p) for p in probs]
+            status = 'ok'
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+            status = 'error'
+        # Each worker has its own prediction cache and metrics: report them
+        cache = predictor.cache.stats() if predictor.cache is not None else None
+        conn.send((status, result, cache, REGISTRY.snapshot()))
+
+class _WorkerDied(RuntimeError):
+    pass
+
+class _Worker:
+    __slots__ = ('index', 'process', 'conn', 'batches', 'rows', 'errors',
+                 'busy', 'last_latency_ms', 'started', 'restarts', 'cache', 'metrics')
+
+    def __init__(self, index, process, conn, restarts=0):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.busy = False
+        self.last_latency_ms = None
+        self.started = time.time()
+        self.restarts = restarts
+        self.cache = None
+        self.metrics = {}
+
+class WorkerPool:
+    """
+    Pre-forked inference processes sharing the parent's loaded model.
+
+    The model is loaded once in the parent, then the workers are forked, so the
+    model memory is shared copy-on-write instead of loaded once per worker.
+    Each worker scores one batch at a time on one core; score() hands a batch
+    to an idle worker and splits large batches across several of them.
+    A worker that dies is forked again from the parent and its batch retried once.
+
+    Requires the 'fork' start method (Linux).
+    """
+    def __init__(self, predictor, n_workers=None):
+        self.predictor = predictor
+        self.n_workers = n_workers or os.cpu_count()
+        self._ctx = multiprocessing.get_context('fork')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self.workers = [self._spawn(i) for i in range(self.n_workers)]
+        for w in self.workers:
+            self._idle.put(w)
+        # Fan-out threads for splitting one large batch across workers
+        self._fanout = ThreadPoolExecutor(max_workers=self.n_workers)
+
+    def _spawn(self, index, restarts=0):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(self.predictor, child_conn),
+            name=f"sepsis-worker-{index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(index, process, parent_conn, restarts)
+
+    def _run(self, payloads):
+        try:
+            return self._run_once(payloads)
+        except _WorkerDied:
+            # Scoring has no side effects: retry once on another (or the respawned) worker
+            return self._run_once(payloads)
+
+    def _run_once(self, payloads):
+        worker = self._idle.get()
+        worker.busy = True
+        start = time.perf_counter()
+        try:
+            worker.conn.send(payloads)
+            status, result, worker.cache, worker.metrics = worker.conn.recv()
+        except (EOFError, OSError):
+            # Worker died mid-batch: replace it and report the failure
+            worker.errors += 1
+            worker = self._replace(worker)
+            raise _WorkerDied(f"Inference worker {worker.index} died")
+        finally:
+            worker.busy = False
+            self._idle.put(worker)
+
+        worker.last_latency_ms = (time.perf_counter() - start) * 1000.0
+        if status != 'ok':
+            worker.errors += 1
+            raise RuntimeError(result)
+        worker.batches += 1
+        worker.rows += len(payloads)
+        return result
+
+    def _replace(self, worker):
+        worker.conn.close()
+        worker.process.join(timeout=1)
+        new = self._spawn(worker.index, worker.restarts + 1)
+        with self._lock:
+            self.workers[worker.index] = new
+        return new
+
+    def score(self, payloads):
+        """Scores (current_data, temporal) pairs. Returns a list of probabilities."""
+        n_chunks = min(self.n_workers, max(1, len(payloads) // MIN_CHUNK))
+        if n_chunks == 1:
+            return self._run(payloads)
+        size = math.ceil(len(payloads) / n_chunks)
+        chunks = [payloads[i:i + size] for i in range(0, len(payloads), size)]
+        results = []
+        for part in self._fanout.map(self._run, chunks):
+            results.extend(part)
+        return results
+
+    def health(self):
+        """Per-worker status for the health endpoint."""
+        with self._lock:
+            workers = list(self.workers)
+        return [{
+            "worker": w.index,
+            "pid": w.process.pid,
+            "alive": w.process.is_alive(),
+            "busy": w.busy,
+            "batches": w.batches,
+            "rows": w.rows,
+            "errors": w.errors,
+            "restarts": w.restarts,
+            "last_latency_ms": w.last_latency_ms,
+            "uptime_s": round(time.time() - w.started, 1),
+            "cache": w.cache
+        } for w in workers]
+
+    def cache_stats(self):
+        """Prediction cache counters summed over the workers."""
+        with self._lock:
+            caches = [w.cache for w in self.workers if w.cache is not None]
+        hits = sum(c["hits"] for c in caches)
+        misses = sum(c["misses"] for c in caches)
+        return {
+            "size": sum(c["size"] for c in caches),
+            "hits": hits,
+            "misses": misses,
+            "evictions": sum(c["evictions"] for c in caches),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def metrics_snapshots(self):
+        """Latest metrics snapshot of every worker (see metrics.Registry.render)."""
+        with self._lock:
+            return [w.metrics for w in self.workers]
+
+    def close(self):
+        for w in self.workers:
+            try:
+                w.conn.send(None)
+            except OSError:
+                pass
+        for w in self.workers:
+            w.process.join(timeout=5)
+        self._fanout.shutdown(wait=False)
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from clinical_rules import (RuleEngine, apply_clinical_rules, apply_clinical_rules_batch,
+                            apply_clinical_rules_columns)
+
+CASES = [
+    # features, model probability, expected final probability, expected reason
+    ({'HR': 80}, 0.10, 0.10, None),
+    ({'Lactate': 4.0}, 0.10, 0.95, "Critical Lactate (>= 4.0)"),
+    # Both Lactate and HR fire: the lower priority number wins
+    ({'Lactate': 6.0, 'HR': 30}, 0.10, 0.95, "Critical Lactate (>= 4.0)"),
+    ({'HR': 30}, 0.99, 0.90, "Severe Bradycardia (HR < 40)"),
+    # Guarded rules only override a model that missed it
+    ({'O2Sat': 80}, 0.50, 0.85, "Severe Hypoxia (SpO2 < 85%)"),
+    ({'O2Sat': 80}, 0.75, 0.75, None),
+    ({'SBP': 85}, 0.10, 0.80, "Severe Hypotension (SBP < 90)"),
+    ({'SBP': 85}, 0.30, 0.30, None),
+    # Missing or non-numeric inputs never fire
+    ({'HR': None, 'Lactate': 'high'}, 0.10, 0.10, None),
+]
+
+@pytest.mark.parametrize('features, prob, expected, reason', CASES)
+def test_single_patient(features, prob, expected, reason):
+    final, status, why = apply_clinical_rules(prob, features)
+    assert final == pytest.approx(expected)
+    assert status == ("AI_DERIVED" if reason is None else "OVERRIDE")
+    assert why == ("Model Prediction" if reason is None else reason)
+
+def test_batch_and_columns_match_single_patient():
+    probs = [prob for _, prob, _, _ in CASES]
+    batch = [features for features, _, _, _ in CASES]
+    names = sorted({k for features in batch for k in features})
+    columns = {}
+    for name in names:
+        col = np.full(len(batch), np.nan)
+        for i, features in enumerate(batch):
+            try:
+                col[i] = float(features.get(name))
+            except (TypeError, ValueError):
+                pass
+        columns[name] = col
+
+    singles = [apply_clinical_rules(p, f) for p, f in zip(probs, batch)]
+    assert apply_clinical_rules_batch(probs, batch) == [(pytest.approx(p), s, r) for p, s, r in singles]
+    final, reasons = apply_clinical_rules_columns(np.array(probs), columns)
+    assert final.tolist() == pytest.approx([p for p, _, _ in singles])
+    assert reasons.tolist() == [reason for _, _, _, reason in CASES]
+
+def test_unknown_comparator_is_rejected():
+    with pytest.raises(ValueError):
+        RuleEngine([(1, 'HR', '=>', 40, 0.9, None, "typo")])
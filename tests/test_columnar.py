@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import api
+import columnar
+from features import VITALS, vitals_vector
+from inference import ColumnBatch, SepsisPredictor
+from patient_store import PatientHistoryStore
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'sepsis_xgboost.pkl')
+HOUR = 3600
+HR = VITALS.index('HR')
+
+def arrow_body(table):
+    pa = pytest.importorskip('pyarrow')
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+@pytest.fixture(scope='module')
+def predictor():
+    return SepsisPredictor(MODEL_PATH)
+
+@pytest.fixture
+def history(monkeypatch):
+    store = PatientHistoryStore()
+    monkeypatch.setattr(api, 'history_store', store)
+    monkeypatch.setattr(api, 'event_log', None)
+    return store
+
+def test_arrow_patient_ids_are_strings():
+    pa = pytest.importorskip('pyarrow')
+    body = arrow_body(pa.table({'patient_id': pa.array([7, None], pa.int64()), 'HR': [90.0, 80.0]}))
+    columns, n = columnar.decode(body, 'arrow')
+    assert n == 2
+    assert columns['patient_id'] == ['7', None]
+
+def test_patient_history_shared_across_formats(history):
+    pa = pytest.importorskip('pyarrow')
+    # Hour 0 over Arrow with an integer ID, hour 1 over JSON with the same ID as a string
+    body = arrow_body(pa.table({'patient_id': pa.array([7], pa.int64()), 'HR': [90.0],
+                                'timestamp': [0.0]}))
+    api.split_columns(*columnar.decode(body, 'arrow'))
+    body = json.dumps({'patient_id': ['7'], 'HR': [100.0], 'timestamp': [float(HOUR)]}).encode()
+    batch, patient_ids = api.split_columns(*columnar.decode(body, 'json'))
+
+    assert patient_ids == ['7']
+    assert len(history) == 1
+    assert batch.lag1[0, HR] == 90
+    assert batch.delta[0, HR] == 10
+
+def test_vital_names_are_case_insensitive(predictor):
+    # 'hr' fills the HR slot and its temporal features in every format, as in /predict/batch
+    columns, n = columnar.decode(b'{"hr": [100.0]}', 'json')
+    [prob] = predictor.predict_columns(ColumnBatch.from_columns(columns, n))
+    [expected] = predictor.predict_batch([{'hr': 100.0}])
+    assert prob == pytest.approx(expected, abs=1e-6)
+    assert prob == pytest.approx(0.21441657841205597, abs=1e-6)
+    assert vitals_vector({'hr': 100.0})[HR] == 100.0
+
+# Rows with missing vitals and a rule override (Lactate >= 4)
+ROWS = [
+    {'HR': 100.0},
+    {'HR': 120.0, 'SBP': 95.0, 'Resp': 24.0, 'Age': 70.0},
+    {'HR': 84.0, 'SBP': 123.0, 'MAP': 82.0, 'O2Sat': 97.0, 'Temp': 37.0, 'Resp': 18.0},
+    {'HR': 130.0, 'Lactate': 5.0, 'WBC': 18.0},
+    {},
+]
+LOWERCASE_ROWS = [{k.lower(): v for k, v in row.items()} for row in ROWS[:3]]
+
+@pytest.fixture(scope='module')
+def client():
+    from fastapi.testclient import TestClient
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(api, 'EVENT_LOG_PATH', '')
+        with TestClient(api.app) as client:
+            for _ in range(100):
+                if client.get('/ready').status_code == 200:
+                    break
+                time.sleep(0.1)
+            yield client
+
+def columnar_bodies(rows):
+    columns = {name: [row.get(name) for row in rows] for name in sorted({k for row in rows for k in row})}
+    yield 'application/json', json.dumps(columns).encode()
+    try:
+        import msgpack
+        yield 'application/msgpack', msgpack.packb(columns)
+    except ImportError:
+        pass
+    try:
+        import pyarrow as pa
+        yield 'application/vnd.apache.arrow.stream', arrow_body(pa.table(
+            {name: pa.array(col, pa.float64()) for name, col in columns.items()}))
+    except ImportError:
+        pass
+
+@pytest.mark.parametrize('rows', [ROWS, LOWERCASE_ROWS])
+def test_columns_match_json_batch(client, rows):
+    batch = client.post('/predict/batch', json={'patients': rows}).json()['results']
+    for content_type, body in columnar_bodies(rows):
+        response = client.post('/predict/columns', content=body,
+                               headers={'content-type': content_type, 'accept': 'application/json'})
+        assert response.status_code == 200, content_type
+        out = response.json()
+        assert out['raw_probability'] == pytest.approx([r['raw_probability'] for r in batch], abs=1e-6)
+        for key in ('diagnosis', 'alert', 'source'):
+            assert out[key] == [r[key] for r in batch], (content_type, key)
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmark import synthetic_dataset
+from data_loader import DataLoader
+
+@pytest.fixture(scope='module')
+def loader():
+    loader = DataLoader(None)
+    loader.raw_df = synthetic_dataset(4000, seed=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.preprocess()
+    return loader
+
+def test_split_views_share_one_buffer(loader, tmp_path):
+    for mmap_path in (None, str(tmp_path / 'X.npy')):
+        with contextlib.redirect_stdout(io.StringIO()):
+            splits = loader.split_views(mmap_path=mmap_path)
+        parts = [splits.part(name) for name in ('train', 'val', 'test')]
+        for X, y in parts:
+            assert np.shares_memory(X, splits.X)
+            assert np.shares_memory(y, splits.y)
+        assert sum(len(X) for X, _ in parts) == len(splits.X)
+
+def test_split_views_match_split_data(loader):
+    with contextlib.redirect_stdout(io.StringIO()):
+        splits = loader.split_views()
+        X_train, y_train, X_val, y_val, X_test, y_test = loader.split_data()
+    for name, (X_df, y_s) in zip(('train', 'val', 'test'),
+                                 ((X_train, y_train), (X_val, y_val), (X_test, y_test))):
+        X, y = splits.part(name)
+        assert list(X_df.columns) == splits.feature_names
+        np.testing.assert_array_equal(X, X_df.to_numpy(dtype=np.float32))
+        np.testing.assert_array_equal(y, y_s.to_numpy())
+
+def test_tuning_folds_follow_training_split(loader):
+    with contextlib.redirect_stdout(io.StringIO()):
+        splits = loader.split_views()
+    folds, test_idx = loader.split_folds(3)
+    np.testing.assert_array_equal(test_idx, splits.test_idx)
+    np.testing.assert_array_equal(folds[0][0], splits.train_idx)
+    np.testing.assert_array_equal(folds[0][1], splits.val_idx)
+    features = loader.processed_df[splits.feature_names].to_numpy(dtype=np.float32)
+    for train_idx, val_idx in folds:
+        assert not np.isin(train_idx, test_idx).any() and not np.isin(val_idx, test_idx).any()
+        np.testing.assert_array_equal(splits.X[splits.positions(val_idx)], features[val_idx])
+
+def test_stream_chunks_process_in_any_order(tmp_path):
+    # Chunks shorter than a patient stay: the carry spans several chunks
+    path = str(tmp_path / 'cohort.csv')
+    synthetic_dataset(2000, seed=3).to_csv(path, index=False)
+    loader = DataLoader(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = pd.concat(list(loader.load_data_stream(37)))
+        pairs = list(loader.stream_chunks(37, loader.medians))
+    parts = [loader.process_chunk(chunk, carry) for chunk, carry in reversed(pairs)]
+    pd.testing.assert_frame_equal(pd.concat(parts[::-1]), expected)
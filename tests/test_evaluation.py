@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.metrics import average_precision_score, roc_auc_score
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from evaluation import CohortEvaluation
+
+THRESHOLDS = {'critical': 0.5}
+
+def test_ranking_scores_match_sklearn():
+    rng = np.random.default_rng(0)
+    n = 2000
+    labels = (rng.random(n) < 0.1).astype(int)
+    # Rounded scores: plenty of ties
+    probs = np.round(np.clip(rng.normal(0.3 + 0.2 * labels, 0.15), 0, 1), 2)
+    patients = np.repeat(np.arange(n // 20), 20)
+    hours = np.tile(np.arange(20), n // 20)
+    metrics = CohortEvaluation(probs, labels, patients, hours, THRESHOLDS).metrics()
+    assert metrics['auc'] == pytest.approx(roc_auc_score(labels, probs))
+    assert metrics['auprc'] == pytest.approx(average_precision_score(labels, probs))
+
+def test_patient_level_alerts():
+    # Patient a: septic from hour 5, first alert at hour 3 (2 h lead), two alert episodes
+    # Patient b: not septic, one false alarm; patient c: septic, never alerted
+    rows = [
+        ('a', 0, 0.1, 0), ('a', 3, 0.6, 0), ('a', 4, 0.2, 0), ('a', 5, 0.7, 1), ('a', 6, 0.8, 1),
+        ('b', 0, 0.2, 0), ('b', 1, 0.9, 0), ('b', 2, 0.1, 0),
+        ('c', 0, 0.1, 1), ('c', 1, 0.2, 1),
+    ]
+    rng = np.random.default_rng(1)
+    patients, hours, probs, labels = map(np.array, zip(*[rows[i] for i in rng.permutation(len(rows))]))
+    critical = CohortEvaluation(probs, labels, patients, hours, THRESHOLDS).metrics()['critical']
+    assert critical['sensitivity'] == 0.5
+    assert critical['sensitivity_before_onset'] == 0.5
+    assert critical['median_lead_hours'] == 2.0
+    assert critical['false_alarm_rate'] == 1.0
+    assert critical['patient_ppv'] == 0.5
+    # 4 alert hours and 3 episodes over 10 patient-hours
+    assert critical['alert_hours_per_patient_day'] == pytest.approx(4 / (10 / 24))
+    assert critical['alert_episodes_per_patient_day'] == pytest.approx(3 / (10 / 24))
+
+def test_patient_weights_equal_duplicated_patients():
+    rng = np.random.default_rng(2)
+    patients = np.repeat(np.arange(30), 10)
+    hours = np.tile(np.arange(10), 30)
+    labels = ((patients % 4 == 0) & (hours >= 5)).astype(int)
+    probs = np.round(rng.random(len(patients)), 3)
+    weights = rng.integers(0, 3, 30)
+
+    weighted = CohortEvaluation(probs, labels, patients, hours, THRESHOLDS).metrics(weights)
+    # The same cohort with each patient repeated weight times (under new IDs)
+    rows = np.concatenate([np.flatnonzero(patients == p) for p in range(30) for _ in range(weights[p])])
+    copies = np.concatenate([np.full(10, k) for k in range(len(rows) // 10)])
+    duplicated = CohortEvaluation(probs[rows], labels[rows], copies, hours[rows], THRESHOLDS).metrics()
+
+    assert weighted['auc'] == pytest.approx(duplicated['auc'])
+    assert weighted['auprc'] == pytest.approx(duplicated['auprc'])
+    for key, value in duplicated['critical'].items():
+        assert weighted['critical'][key] == pytest.approx(value, nan_ok=True), key
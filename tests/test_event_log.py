@@ -0,0 +1,94 @@
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from event_log import EventLog
+from features import VITALS
+from patient_store import PatientHistoryStore
+
+HOUR = 3600
+
+def random_readings(seed, n_patients=6, n_events=400):
+    """(patient, vitals, timestamp) events with gaps, same-hour repeats, late readings and missing vitals."""
+    rng = random.Random(seed)
+    clock = {f'p{i}': rng.randrange(0, 5) * HOUR for i in range(n_patients)}
+    events = []
+    for _ in range(n_events):
+        pid = rng.choice(sorted(clock))
+        step = rng.choice([0, 600, HOUR, HOUR, 2 * HOUR, 5 * HOUR, -2 * HOUR])
+        ts = max(0, clock[pid] + step)
+        clock[pid] = max(clock[pid], ts)
+        vitals = {v: round(rng.uniform(50, 150), 1) for v in VITALS if rng.random() < 0.7}
+        events.append((pid, vitals, float(ts)))
+    return events
+
+def assert_same_histories(live, restored):
+    assert sorted(live._patients) == sorted(restored._patients)
+    for pid, history in live._patients.items():
+        other = restored._patients[pid]
+        assert other.hour == history.hour, pid
+        # Rolling means are running sums: equal up to rounding after a compaction
+        for a, b in zip(history.state.temporal(), other.state.temporal()):
+            np.testing.assert_allclose(np.array(b, dtype=float), np.array(a, dtype=float), rtol=1e-12)
+
+def run_live(log, events, discharge=()):
+    """The API's path: score into the live store, log only the readings it recorded."""
+    live = PatientHistoryStore()
+    for i, (pid, vitals, ts) in enumerate(events):
+        if live.update(pid, vitals, ts) is not None:
+            log.append(pid, vitals, ts)
+        if i in discharge:
+            live.discharge(pid)
+            log.discharge(pid)
+    return live
+
+def test_replay_rebuilds_live_histories(tmp_path):
+    log = EventLog(str(tmp_path / 'events.sqlite3'), flush_interval_ms=60_000)
+    try:
+        live = run_live(log, random_readings(1), discharge={150})
+        restored = PatientHistoryStore()
+        assert log.replay(restored) == len(live)
+        assert_same_histories(live, restored)
+    finally:
+        log.close()
+
+def test_replay_after_compaction(tmp_path):
+    path = str(tmp_path / 'events.sqlite3')
+    log = EventLog(path, flush_interval_ms=60_000)
+    events = random_readings(2)
+    live = run_live(log, events[:250])
+    log.flush()
+    compacted = log.compact()
+    assert compacted > 0
+    # More events after the compaction, then a restart
+    for pid, vitals, ts in events[250:]:
+        if live.update(pid, vitals, ts) is not None:
+            log.append(pid, vitals, ts)
+    log.compact()
+    log.close()
+
+    log = EventLog(path, flush_interval_ms=60_000)
+    try:
+        restored = PatientHistoryStore()
+        log.replay(restored)
+        assert_same_histories(live, restored)
+    finally:
+        log.close()
+
+def test_replay_skips_idle_patients(tmp_path):
+    log = EventLog(str(tmp_path / 'events.sqlite3'), ttl_seconds=HOUR, flush_interval_ms=60_000)
+    try:
+        log.append('old', {'HR': 80}, 0.0, received=time.time() - 2 * HOUR)
+        log.append('new', {'HR': 90}, 0.0)
+        restored = PatientHistoryStore()
+        assert log.replay(restored) == 1
+        assert 'new' in restored and 'old' not in restored
+        assert math.isclose(restored._patients['new'].state.temporal()[0][VITALS.index('HR')], 90)
+    finally:
+        log.close()
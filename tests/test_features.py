@@ -0,0 +1,50 @@
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from features import VITALS, RollingState, engineer_column, segment_positions, patient_starts
+from inference import SepsisPredictor
+from patient_store import PatientHistoryStore
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'sepsis_xgboost.pkl')
+
+# Scores of the pre-refactor pipeline (per-request pandas features) on the shipped model
+BASELINE_SCORES = [
+    ({'HR': 100}, 0.21441657841205597),
+    ({'HR': 80, 'Temp': 37.0}, 0.1441926211118698),
+    ({'HR': 120, 'SBP': 95, 'Lactate': 3.0, 'Resp': 24}, 0.03789827972650528),
+    ({'HR': 84, 'SBP': 123, 'MAP': 82, 'O2Sat': 97, 'Temp': 37.0, 'Resp': 18}, 0.13541953265666962),
+]
+
+@pytest.fixture(scope='module')
+def predictor():
+    return SepsisPredictor(MODEL_PATH)
+
+def test_delta_cold_start_and_missing():
+    values = np.array([80.0, np.nan, 90.0, np.nan, 100.0])
+    pids = np.array([1, 1, 1, 2, 2])
+    lag1, delta, _ = engineer_column(values, segment_positions(patient_starts(pids)))
+    # First reading: 0; missing Current: NaN; otherwise Current - previous
+    assert delta[0] == 0.0
+    assert math.isnan(delta[1])
+    assert math.isnan(delta[3])
+    assert delta[4] == 0.0
+
+def test_rolling_state_delta_missing_vital():
+    state = RollingState()
+    state.push([80.0] + [math.nan] * (len(VITALS) - 1))
+    _, _, delta, _ = state.temporal()
+    assert delta[0] == 0.0
+    assert all(math.isnan(d) for d in delta[1:])
+
+@pytest.mark.parametrize('payload, expected', BASELINE_SCORES)
+def test_partial_payload_matches_baseline(predictor, payload, expected):
+    assert predictor.predict(payload) == pytest.approx(expected, abs=1e-6)
+    assert float(predictor.predict_batch([payload])[0]) == pytest.approx(expected, abs=1e-6)
+    temporal = PatientHistoryStore().update('p1', payload, 0)
+    assert predictor.predict(payload, temporal=temporal) == pytest.approx(expected, abs=1e-6)
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from micro_batcher import MicroBatcher
+
+def test_concurrent_requests_share_one_call():
+    calls = []
+
+    def score(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(score, max_batch=64, max_wait_ms=50)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+
+    assert asyncio.run(main()) == [i * 10 for i in range(20)]
+    assert calls == [list(range(20))]
+
+def test_batches_are_capped_at_max_batch():
+    calls = []
+
+    def score(items):
+        calls.append(len(items))
+        return list(items)
+
+    async def main():
+        batcher = MicroBatcher(score, max_batch=8, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == list(range(20))
+    assert max(calls) <= 8 and sum(calls) == 20
+    assert stats['batch_size']['count'] == len(calls)
+
+def test_errors_reach_every_request_of_the_batch():
+    def score(items):
+        raise RuntimeError("model down")
+
+    async def main():
+        batcher = MicroBatcher(score, max_batch=64, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_batcher_recovers_after_an_error():
+    calls = []
+
+    def score(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return list(items)
+
+    async def main():
+        batcher = MicroBatcher(score, max_batch=64, max_wait_ms=1)
+        with pytest.raises(RuntimeError):
+            await batcher.submit(1)
+        return await batcher.submit(2)
+
+    assert asyncio.run(main()) == 2
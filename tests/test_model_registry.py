@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from model_registry import ModelRegistry, ModelVersion
+from prediction_cache import PredictionCache
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'sepsis_xgboost.pkl')
+
+class ConstantPredictor:
+    """Scores every row with one probability and remembers the batches it saw."""
+    def __init__(self, prob):
+        self.prob = prob
+        self.batches = []
+        self.cache = None
+
+    def predict_batch(self, batch, temporals=None):
+        self.batches.append(batch)
+        return [self.prob] * len(batch)
+
+def version(name, prob):
+    return ModelVersion(name, f"{name}.pkl", ConstantPredictor(prob))
+
+PAYLOADS = [({'HR': 80 + i}, None) for i in range(200)]
+
+@pytest.fixture
+def registry():
+    registry = ModelRegistry()
+    registry.activate(version('v1', 0.1))
+    yield registry
+    registry.close()
+
+def test_active_model_answers_without_a_candidate(registry):
+    assert registry.score(PAYLOADS[:3]) == [(0.1, 'v1')] * 3
+
+def test_canary_answers_its_share_of_rows(registry):
+    registry._random.seed(0)
+    registry.set_candidate(version('v2', 0.2), 'canary', 30.0)
+    results = registry.score(PAYLOADS)
+    by_version = {v: [p for p, w in results if w == v] for v in ('v1', 'v2')}
+    assert set(by_version['v1']) == {0.1} and set(by_version['v2']) == {0.2}
+    assert 30 < len(by_version['v2']) < 90
+
+    registry.set_candidate(registry.candidate, 'canary', 100.0)
+    assert {v for _, v in registry.score(PAYLOADS)} == {'v2'}
+
+def test_shadow_scores_a_copy_in_the_background(registry):
+    candidate = version('v2', 0.2)
+    registry.set_candidate(candidate, 'shadow', 100.0)
+    assert registry.score(PAYLOADS[:5]) == [(0.1, 'v1')] * 5
+    registry._shadow.submit(lambda: None).result()  # the shadow queue is drained in order
+    assert candidate.predictor.batches == [[data for data, _ in PAYLOADS[:5]]]
+
+def test_promote_makes_the_candidate_active(registry):
+    registry.set_candidate(version('v2', 0.2), 'canary', 10.0)
+    with pytest.raises(KeyError):
+        registry.promote('v3')
+    registry.promote('v2')
+    assert registry.active.version == 'v2'
+    assert registry.candidate is None and registry.percent == 0.0
+    assert registry.score(PAYLOADS[:2]) == [(0.2, 'v2')] * 2
+
+def test_candidate_settings_are_validated(registry):
+    with pytest.raises(ValueError):
+        registry.set_candidate(version('v2', 0.2), 'blue-green', 10.0)
+    with pytest.raises(ValueError):
+        registry.set_candidate(version('v2', 0.2), 'canary', 150.0)
+
+def test_load_leaves_the_cache_untouched():
+    registry = ModelRegistry(cache_factory=PredictionCache)
+    loaded = registry.load(MODEL_PATH, 'shipped')
+    stats = loaded.cache_stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (0, 0, 0)
+    registry.activate(loaded)
+    registry.score(PAYLOADS[:1])
+    registry.score(PAYLOADS[:1])
+    stats = loaded.cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    registry.close()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import DROPPED_READINGS
+from patient_store import PatientHistoryStore
+
+HOUR = 3600
+
+def test_out_of_order_reading_is_dropped():
+    store = PatientHistoryStore()
+    store.update('p1', {'HR': 80}, 10 * HOUR)
+    store.update('p1', {'HR': 90}, 11 * HOUR)
+    dropped = DROPPED_READINGS.snapshot().get('late', 0)
+
+    # Reading for hour 10 arriving after hour 11: not recorded, newest hour untouched
+    assert store.update('p1', {'HR': 200}, 10 * HOUR + 60) is None
+    assert DROPPED_READINGS.snapshot().get('late', 0) == dropped + 1
+
+    features = store.update('p1', {'HR': 100}, 12 * HOUR)
+    assert features['HR_Lag1'] == 90
+    assert features['HR_Delta'] == 10
+    assert features['HR_RollMean6h'] == 90
+
+def test_same_hour_reading_replaces_current():
+    store = PatientHistoryStore()
+    store.update('p1', {'HR': 80}, 10 * HOUR)
+    store.update('p1', {'HR': 90}, 11 * HOUR)
+    features = store.update('p1', {'HR': 95}, 11 * HOUR + 1800)
+    assert features['HR'] == 95
+    assert features['HR_Lag1'] == 80
+    assert features['HR_RollMean6h'] == 87.5
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from prediction_cache import PredictionCache, row_keys
+
+def test_row_keys_merge_representation_noise():
+    X = np.array([
+        [0.1 + 0.2, -0.0, np.nan],
+        [0.3, 0.0, float('nan')],
+        [0.31, 0.0, np.nan],
+    ])
+    keys = row_keys(X)
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+
+def test_hits_misses_and_lru_eviction():
+    cache = PredictionCache(max_size=2)
+    a, b, c = row_keys(np.array([[1.0], [2.0], [3.0]]))
+    assert cache.get_many([a, b]) == [None, None]
+    cache.put_many([a, b], [0.1, 0.2])
+    assert cache.get_many([a]) == [0.1]  # a is now the most recent
+    cache.put_many([c], [0.3])            # evicts b
+    assert cache.get_many([a, b, c]) == [0.1, None, 0.3]
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (3, 3, 1)
+    assert stats['hit_rate'] == 0.5
+    assert len(cache) == 2
+
+def test_expired_entries_are_misses():
+    cache = PredictionCache(ttl_seconds=-1)
+    [key] = row_keys(np.array([[1.0]]))
+    cache.put_many([key], [0.5])
+    assert cache.get_many([key]) == [None]
+    assert len(cache) == 0
@@ -0,0 +1,60 @@
+import contextlib
+import io
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmark import synthetic_dataset
+from data_loader import DataLoader
+from inference import SepsisPredictor
+from train_model import SepsisModel
+from tree_runtime import TreeEnsemble, compile_booster_json
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'sepsis_xgboost.pkl')
+
+@pytest.fixture(scope='module')
+def model():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return joblib.load(MODEL_PATH)
+
+@pytest.fixture(scope='module')
+def features(model):
+    """Processed synthetic rows in the model's column order, with extra missing values."""
+    loader = DataLoader(None)
+    loader.raw_df = synthetic_dataset(3000, seed=4)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.preprocess()
+    X = loader.processed_df.reindex(columns=model.get_booster().feature_names).to_numpy(dtype=np.float32)
+    X[np.random.default_rng(0).random(X.shape) < 0.2] = np.nan
+    return X
+
+def test_runtime_matches_predict_proba(model, features):
+    runtime = TreeEnsemble(compile_booster_json(model.get_booster().save_raw('json')))
+    X = pd.DataFrame(features, columns=runtime.feature_names)
+    np.testing.assert_allclose(runtime.predict_proba(features), model.predict_proba(X)[:, 1], atol=1e-6)
+
+def test_exported_model_scores_like_pickle(model, features, tmp_path):
+    trainer = SepsisModel()
+    trainer.model = model
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, npz_path = trainer.export_model(str(tmp_path / 'model'))
+        exported = SepsisPredictor(npz_path)
+        pickled = SepsisPredictor(MODEL_PATH)
+    np.testing.assert_allclose(exported.score(features), pickled.score(features), atol=1e-6)
+
+def test_runtime_stops_at_best_iteration(features):
+    import xgboost as xgb
+    rng = np.random.default_rng(1)
+    X = features[:, :8]
+    y = (np.nan_to_num(X[:, 0]) + rng.normal(0, 20, len(X)) > 90).astype(int)
+    model = xgb.XGBClassifier(n_estimators=200, max_depth=3, early_stopping_rounds=5, eval_metric='logloss')
+    model.fit(X[:2000], y[:2000], eval_set=[(X[2000:], y[2000:])], verbose=False)
+    assert model.best_iteration < 199
+    runtime = TreeEnsemble(compile_booster_json(model.get_booster().save_raw('json')))
+    np.testing.assert_allclose(runtime.predict_proba(X), model.predict_proba(X)[:, 1], atol=1e-6)